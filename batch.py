@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Пакетная генерация и решение полей "Выключи свет" на NumPy
+
+Модуль предназначен для офлайн-обработки миллионов полей (ежедневные
+наборы головоломок, аналитика) и требует NumPy. Псевдообратная матрица,
+проверки и базис ядра берутся у того же решателя (solver.get_solver),
+что и в интерактивной игре, поэтому результаты совпадают с Game.solve()
+и Game.solve(optimal=True).
+
+Поля передаются в одном из двух представлений:
+    - одномерный массив uint32/uint64 битовых масок (поля до 64 клеток),
+    - матрица uint8 размера (N, size * size) из нулей и единиц.
+Результаты возвращаются в том же представлении, что и входные поля.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+from config import DIFFICULTY_LEVELS
+from bitboard import DEFAULT_TOPOLOGY, iter_bits, toggle_masks
+from difficulty_table import get_table
+from game_logic import MAX_DIFFICULTY_ATTEMPTS, difficulty_range
+from solver import MAX_ENUMERATED_NULLITY, get_solver
+
+
+# Поля до 64 клеток можно хранить как битовые маски uint64
+MAX_PACKED_CELLS = 64
+
+
+def _to_matrix(vectors, cells):
+    """Битовые маски (числа Python) -> строки матрицы uint8"""
+    matrix = np.zeros((len(vectors), cells), dtype=np.uint8)
+    for row, vector in enumerate(vectors):
+        matrix[row, list(iter_bits(vector))] = 1
+    return matrix
+
+
+class BatchModel:
+    """Матрицы переключения, решения и проверки разрешимости для размера поля"""
+
+    def __init__(self, size, topology=DEFAULT_TOPOLOGY):
+        self.size = size
+        self.cells = size * size
+        masks = toggle_masks(size, topology)
+        solver = get_solver(size, topology)
+
+        # Столбец j - клетки, переключаемые нажатием j
+        self.toggle = _to_matrix([masks[index] for index in range(self.cells)], self.cells).T.copy()
+        # Столбец j - вклад клетки j поля в решение
+        self.inverse = _to_matrix(solver.inverse, self.cells).T.copy()
+        self.checks = _to_matrix(solver.checks, self.cells)
+        self.null_space = _to_matrix(solver.null_space, self.cells)
+
+
+@lru_cache(maxsize=None)
+def get_model(size, topology=DEFAULT_TOPOLOGY):
+    """Пакетная модель для поля заданного размера и топологии (кэшируется)"""
+    return BatchModel(size, topology)
+
+
+def _mul_mod2(left, right):
+    """Произведение матриц из нулей и единиц по модулю 2
+
+    Умножение выполняется в float32 через BLAS: суммы не превышают числа
+    клеток и представляются точно.
+    """
+    product = left.astype(np.float32) @ right.astype(np.float32)
+    return (product.astype(np.int64) & 1).astype(np.uint8)
+
+
+def unpack_boards(boards, size):
+    """Битовые маски полей -> матрица uint8 (N, size * size)"""
+    boards = np.asarray(boards, dtype=np.uint64)
+    shifts = np.arange(size * size, dtype=np.uint64)
+    return ((boards[:, None] >> shifts) & np.uint64(1)).astype(np.uint8)
+
+
+def pack_boards(matrix):
+    """Матрица uint8 (N, cells) -> битовые маски uint64"""
+    matrix = np.asarray(matrix, dtype=np.uint64)
+    shifts = np.arange(matrix.shape[1], dtype=np.uint64)
+    return np.bitwise_or.reduce(matrix << shifts, axis=1)
+
+
+def _as_matrix(boards, size):
+    """Поля в виде матрицы uint8 и признак упакованного представления"""
+    boards = np.asarray(boards)
+    if boards.ndim == 1:
+        if size * size > MAX_PACKED_CELLS:
+            raise ValueError(f"Битовые маски поддерживают поля не более {MAX_PACKED_CELLS} клеток")
+        return unpack_boards(boards, size), True
+    if boards.shape[1] != size * size:
+        raise ValueError(f"Ожидались строки из {size * size} клеток, получено {boards.shape[1]}")
+    return boards.astype(np.uint8, copy=False), False
+
+
+def apply_presses(presses, size, topology=DEFAULT_TOPOLOGY):
+    """Поля, получаемые нажатиями presses из выключенного поля"""
+    matrix, packed = _as_matrix(presses, size)
+    boards = _mul_mod2(matrix, get_model(size, topology).toggle.T)
+    return pack_boards(boards) if packed else boards
+
+
+def _random_presses(count, cells, min_moves, max_moves, rng):
+    """Случайные нажатия различных клеток: их число в каждой строке из [min_moves, max_moves]"""
+    # Нажимаются клетки с наименьшими случайными ключами: все нажатия различны
+    moves = np.minimum(rng.integers(min_moves, max_moves, size=count, endpoint=True), cells)
+    ranks = rng.random((count, cells)).argsort(axis=1).argsort(axis=1)
+    return (ranks < moves[:, None]).astype(np.uint8)
+
+
+def _length_distance(boards, size, topology, min_moves, max_moves):
+    """Насколько длина оптимального решения каждого поля выходит за [min_moves, max_moves]"""
+    presses, _ = solve_boards(boards, size, optimal=True, topology=topology)
+    lengths = presses.sum(axis=1, dtype=np.int64)
+    return np.maximum(min_moves - lengths, 0) + np.maximum(lengths - max_moves, 0)
+
+
+def generate_boards(count, size, difficulty='Средний', rng=None, topology=DEFAULT_TOPOLOGY):
+    """Генерация count головоломок уровня difficulty
+
+    Как и Game.generate_puzzle, поля выбираются из таблицы сложности, если
+    она есть, иначе применяются случайные нажатия различных клеток, и поля
+    с длиной оптимального решения вне диапазона генерируются заново.
+    Поля до 64 клеток возвращаются битовыми масками uint64.
+    """
+    rng = np.random.default_rng(rng)
+    min_moves, max_moves = difficulty_range(size, *DIFFICULTY_LEVELS[difficulty], topology)
+    cells = size * size
+
+    table = get_table(size, topology)
+    if table is not None:
+        start, end = table.index_range(min_moves, max_moves)
+        if start < end:
+            entries = np.frombuffer(table.buffer, dtype="<u4", count=table.count,
+                                    offset=table.data_offset)
+            boards = entries[rng.integers(start, end, size=count)].astype(np.uint64)
+            return boards if cells <= MAX_PACKED_CELLS else unpack_boards(boards, size)
+
+    model = get_model(size, topology)
+    boards = _mul_mod2(_random_presses(count, cells, min_moves, max_moves, rng), model.toggle.T)
+
+    # При нетривиальном ядре часть нажатий сокращается: такие поля генерируются
+    # заново, а если попытки кончились, остается поле с длиной ближе всего к диапазону
+    if 0 < len(model.null_space) <= MAX_ENUMERATED_NULLITY:
+        distance = _length_distance(boards, size, topology, min_moves, max_moves)
+        for _ in range(MAX_DIFFICULTY_ATTEMPTS - 1):
+            retry = np.flatnonzero(distance)
+            if not len(retry):
+                break
+            candidates = _mul_mod2(_random_presses(len(retry), cells, min_moves, max_moves, rng),
+                                   model.toggle.T)
+            candidate_distance = _length_distance(candidates, size, topology, min_moves, max_moves)
+            better = candidate_distance < distance[retry]
+            boards[retry[better]] = candidates[better]
+            distance[retry[better]] = candidate_distance[better]
+    return pack_boards(boards) if cells <= MAX_PACKED_CELLS else boards
+
+
+def check_solvable(boards, size, topology=DEFAULT_TOPOLOGY):
+    """Булев массив: имеет ли каждое поле решение"""
+    matrix, _ = _as_matrix(boards, size)
+    checks = get_model(size, topology).checks
+    if not len(checks):
+        return np.ones(len(matrix), dtype=bool)
+    return ~_mul_mod2(matrix, checks.T).any(axis=1)
+
+
+def solve_boards(boards, size, optimal=False, topology=DEFAULT_TOPOLOGY):
+    """Решение всех полей одним умножением матриц по модулю 2
+
+    Возвращает пару (presses, solvable): нажатия в представлении входных
+    полей и булев массив разрешимости. Для неразрешимых полей нажатия
+    нулевые. При optimal=True для каждого поля выбирается решение с
+    наименьшим числом нажатий перебором ядра.
+    """
+    matrix, packed = _as_matrix(boards, size)
+    model = get_model(size, topology)
+    solvable = check_solvable(matrix, size, topology)
+    presses = _mul_mod2(matrix, model.inverse.T)
+    presses[~solvable] = 0
+
+    if optimal and len(model.null_space):
+        if len(model.null_space) > MAX_ENUMERATED_NULLITY:
+            raise ValueError("Ядро слишком велико для полного перебора")
+        best_weight = presses.sum(axis=1, dtype=np.int64)
+        current = presses.copy()
+        # Перебор ядра в порядке кода Грея, как в solver.minimum_weight
+        for i in range(1, 1 << len(model.null_space)):
+            current ^= model.null_space[(i & -i).bit_length() - 1]
+            weight = current.sum(axis=1, dtype=np.int64)
+            better = (weight < best_weight) & solvable
+            presses[better] = current[better]
+            best_weight[better] = weight[better]
+
+    return (pack_boards(presses) if packed else presses), solvable
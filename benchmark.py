@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Замеры производительности "Выключи свет"
+
+    python benchmark.py                              # замер и сравнение с базой
+    python benchmark.py --output results.json        # сохранить результаты
+    python benchmark.py --save-baseline              # обновить базу
+    python benchmark.py --sizes 5 20 --no-gui        # только движок на малых полях
+
+Измеряется время одной операции (лучшее из нескольких серий):
+    make_move, is_solved          - ход и проверка победы
+    generate_puzzle               - reset_game с генерацией головоломки
+    solver_build, solve,
+    solve_optimal                 - построение решателя и решение поля
+    update_display, click_to_paint,
+    create_grid                   - окно под QT_QPA_PLATFORM=offscreen
+    time_to_first_paint           - запуск окна в отдельном процессе до
+                                    первой отрисовки поля
+
+Замеры выполняются без файла таблицы сложности (data/difficulty_<n>x<n>.bin
+не хранится в репозитории), поэтому на свежей копии они сравнимы с базой;
+есть ли таблица на машине, записывается в "meta".
+
+Результаты сравниваются с базой (benchmark_baseline.json): операция,
+ставшая медленнее более чем на threshold, считается регрессией, и
+команда завершается с кодом 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timezone
+
+import catalogue
+import difficulty_table
+
+
+SIZES = (5, 20, 100, 1000)
+GUI_SIZES = (5, 20, 100)
+REPEAT = 5
+MIN_SERIES_TIME = 0.1  # Серия повторяется, пока не займет хотя бы столько секунд
+DEFAULT_THRESHOLD = 0.5
+STARTUP_RUNS = 5
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+
+def measure(function, repeat=REPEAT):
+    """Лучшее время одного запуска function по repeat сериям
+
+    Число запусков в серии подбирается так, чтобы серия длилась не меньше
+    MIN_SERIES_TIME: короткие серии слишком зависят от шума.
+    """
+    timer = timeit.Timer(function)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= MIN_SERIES_TIME:
+            break
+        number = max(number * 2, int(number * MIN_SERIES_TIME / max(elapsed, 1e-9) * 1.2))
+    return min([elapsed] + timer.repeat(repeat=repeat - 1, number=number)) / number
+
+
+def random_cells(size, count, rng):
+    """Случайные клетки (row, col) для серии ходов"""
+    return [(rng.randrange(size), rng.randrange(size)) for _ in range(count)]
+
+
+def bench_engine(size, results):
+    """Ход, проверка победы, генерация и решение на поле size x size"""
+    from game_logic import Game
+    from solver import get_solver
+
+    rng = random.Random(size)
+    game = Game('Средний', size)
+    game.reset_game(rng=rng)
+
+    cells = random_cells(size, 1000, rng)
+    make_move = game.make_move
+
+    def moves():
+        for row, col in cells:
+            make_move(row, col)
+
+    results[f"make_move/{size}"] = measure(moves) / len(cells)
+
+    def checks():
+        for _ in range(1000):
+            game.is_solved
+
+    results[f"is_solved/{size}"] = measure(checks) / 1000
+
+    results[f"generate_puzzle/{size}"] = measure(lambda: game.reset_game(rng=rng))
+
+    results[f"solver_build/{size}"] = measure(lambda: get_solver.__wrapped__(size), repeat=3)
+    solver = get_solver(size)
+    board = game.board
+    results[f"solve/{size}"] = measure(lambda: solver.solve(board))
+    results[f"solve_optimal/{size}"] = measure(lambda: solver.solve_optimal(board))
+
+
+def bench_gui(sizes, results):
+    """Обновление и создание игрового поля в окне без дисплея"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    from main_window import MainWindow
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    window = MainWindow()
+    window.show()
+    app.processEvents()
+    try:
+        for size in sizes:
+            window.set_board_size(size)
+            app.processEvents()
+            game = window.game
+            cells = random_cells(size, 200, random.Random(size))
+
+            def updates():
+                for row, col in cells:
+                    game.make_move(row, col)
+                    window.update_display()
+
+            def clicks():
+                for row, col in cells:
+                    game.make_move(row, col)
+                    window.update_display()
+                    app.processEvents()
+
+            def create_grid():
+                window._create_grid()
+                app.processEvents()
+
+            results[f"update_display/{size}"] = measure(updates) / len(cells)
+            results[f"click_to_paint/{size}"] = measure(clicks) / len(cells)
+            results[f"create_grid/{size}"] = measure(create_grid, repeat=3)
+    finally:
+        window.close()
+        app.processEvents()
+
+
+# Запуск окна с нуля: время от начала скрипта (до импорта PyQt6) до первой отрисовки поля
+STARTUP_SCRIPT = """
+import time
+started = time.perf_counter()
+import sys
+from PyQt6.QtWidgets import QApplication
+app = QApplication(sys.argv[:1])
+import catalogue
+import difficulty_table
+import instrumentation
+from main_window import MainWindow
+catalogue.CATALOGUE_DIR = difficulty_table.TABLE_DIR = sys.argv[1]
+instrumentation.enable(started)
+window = MainWindow()
+window.show()
+while "time_to_first_paint" not in instrumentation.METRICS.histograms:
+    app.processEvents()
+print(instrumentation.METRICS.histograms["time_to_first_paint"].sum)
+window.close()
+"""
+
+
+def bench_startup(results, runs=STARTUP_RUNS):
+    """Время до первой отрисовки при холодном запуске (лучшее из runs процессов)"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+    times = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, catalogue.CATALOGUE_DIR],
+                                cwd=root, env=env, capture_output=True, text=True, check=True).stdout
+        times.append(float(output.split()[-1]))
+    results["time_to_first_paint"] = min(times)
+
+
+def run(sizes=SIZES, gui_sizes=GUI_SIZES):
+    """Все замеры: имя операции -> секунд на операцию"""
+    results = {}
+    for size in sizes:
+        bench_engine(size, results)
+    if gui_sizes:
+        bench_gui(gui_sizes, results)
+        bench_startup(results)
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Сравнение с базой: список (имя, база, текущее, отношение, регрессия ли)"""
+    rows = []
+    for name, seconds in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        ratio = seconds / reference
+        rows.append((name, reference, seconds, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def _format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def main(argv=None):
+    """Запуск замеров из командной строки"""
+    parser = argparse.ArgumentParser(description="Замеры производительности 'Выключи свет'")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="размеры поля для движка")
+    parser.add_argument("--gui-sizes", type=int, nargs="*", default=GUI_SIZES, help="размеры поля для окна")
+    parser.add_argument("--no-gui", action="store_true", help="без замеров окна")
+    parser.add_argument("--output", help="файл для результатов в JSON")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="файл базы для сравнения")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="допустимое замедление (0.5 - на 50%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="записать результаты как базу")
+    args = parser.parse_args(argv)
+
+    # Каталог выданных головоломок ведет только окно, но и его замеры не должны туда попадать;
+    # таблицы сложности нет в свежей копии репозитория, поэтому генерация замеряется без нее
+    table_present = os.path.exists(difficulty_table.table_path(5))
+    catalogue.CATALOGUE_DIR = difficulty_table.TABLE_DIR = tempfile.mkdtemp(prefix="lightsout-bench-")
+    try:
+        results = run(args.sizes, [] if args.no_gui else args.gui_sizes)
+    finally:
+        shutil.rmtree(catalogue.CATALOGUE_DIR, ignore_errors=True)
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "difficulty_table": table_present,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+            file.write("\n")
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+
+    compared = {name: (reference, ratio, regressed)
+                for name, reference, _, ratio, regressed in compare(results, baseline, args.threshold)}
+    regressions = 0
+    for name, seconds in results.items():
+        line = f"{name:28s} {_format_time(seconds):>12s}"
+        if name in compared:
+            reference, ratio, regressed = compared[name]
+            line += f"  база {_format_time(reference):>10s}  x{ratio:.2f}"
+            if regressed:
+                line += "  РЕГРЕССИЯ"
+                regressions += 1
+        print(line)
+    if regressions:
+        print(f"Регрессий: {regressions} (порог {args.threshold:.0%})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
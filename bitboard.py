@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Битовое представление игрового поля "Выключи свет"
+
+Поле размера n x n хранится как одно целое число: клетка (row, col)
+соответствует биту с номером row * n + col. Для каждой клетки заранее
+вычисляется маска переключения, поэтому ход - это одна операция XOR.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+from config import DIAGONAL_DIRECTIONS, DIRECTIONS
+
+
+class Topology(namedtuple('Topology', ['offsets', 'wrap'])):
+    """Соседство клеток: смещения (dr, dc) соседей и замыкание поля в тор
+
+    Нажатие переключает саму клетку и все клетки по смещениям offsets.
+    При wrap=True смещения берутся по модулю размера поля (тор), иначе
+    клетки за границей поля пропускаются. Топология неизменяема и служит
+    ключом кэшей масок и решателей.
+    """
+
+    __slots__ = ()
+
+    def neighbours(self, row, col, size):
+        """Клетки (row, col), переключаемые нажатием, включая саму клетку"""
+        cells = [(row, col)]
+        for dr, dc in self.offsets:
+            new_row, new_col = row + dr, col + dc
+            if self.wrap:
+                new_row, new_col = new_row % size, new_col % size
+            elif not (0 <= new_row < size and 0 <= new_col < size):
+                continue
+            if (new_row, new_col) not in cells:
+                cells.append((new_row, new_col))
+        return cells
+
+
+DEFAULT_TOPOLOGY = Topology(tuple(DIRECTIONS), False)
+
+TOPOLOGIES = {
+    'plus': DEFAULT_TOPOLOGY,
+    'torus': Topology(tuple(DIRECTIONS), True),
+    'moore': Topology(tuple(DIRECTIONS + DIAGONAL_DIRECTIONS), False),
+    'moore-torus': Topology(tuple(DIRECTIONS + DIAGONAL_DIRECTIONS), True),
+}
+
+
+# Для полей большего размера маски не хранятся, а собираются при нажатии
+MAX_PRECOMPUTED_SIZE = 64
+
+
+@lru_cache(maxsize=None)
+def toggle_masks(size, topology=DEFAULT_TOPOLOGY):
+    """Маски переключения для каждой клетки поля (индекс row * size + col)"""
+    if size > MAX_PRECOMPUTED_SIZE:
+        return LazyToggleMasks(size, topology)
+    masks = []
+    for row in range(size):
+        for col in range(size):
+            mask = 0
+            for new_row, new_col in topology.neighbours(row, col, size):
+                mask |= 1 << (new_row * size + new_col)
+            masks.append(mask)
+    return tuple(masks)
+
+
+@lru_cache(maxsize=None)
+def toggle_indices(size, topology=DEFAULT_TOPOLOGY):
+    """Номера клеток, переключаемых нажатием каждой клетки (для игры с k состояниями)"""
+    return tuple(tuple(iter_bits(mask)) for mask in toggle_masks(size, topology))
+
+
+class LazyToggleMasks:
+    """Маски переключения большого поля, собираемые по запросу
+
+    Для каждого смещения строки dr хранится n масок строки (по одной на
+    столбец), поэтому память растет как O(n^2) бит, а не O(n^4).
+    """
+
+    __slots__ = ('_size', '_wrap', '_rows')
+
+    def __init__(self, size, topology):
+        self._size = size
+        self._wrap = topology.wrap
+        offsets = {0: {0}}
+        for dr, dc in topology.offsets:
+            offsets.setdefault(dr, set()).add(dc)
+        self._rows = []
+        for dr, columns in sorted(offsets.items()):
+            patterns = []
+            for col in range(size):
+                pattern = 0
+                for dc in columns:
+                    if topology.wrap:
+                        pattern |= 1 << ((col + dc) % size)
+                    elif 0 <= col + dc < size:
+                        pattern |= 1 << (col + dc)
+                patterns.append(pattern)
+            self._rows.append((dr, tuple(patterns)))
+
+    def __len__(self):
+        return self._size * self._size
+
+    def __getitem__(self, index):
+        size = self._size
+        row, col = divmod(index, size)
+        mask = 0
+        for dr, patterns in self._rows:
+            new_row = row + dr
+            if self._wrap:
+                new_row %= size
+            elif not 0 <= new_row < size:
+                continue
+            mask |= patterns[col] << (new_row * size)
+        return mask
+
+
+def split_rows(board, size):
+    """Разбиение поля на список строк (по size бит в каждой)"""
+    bits = format(board, f'0{size * size}b')
+    end = len(bits)
+    return [int(bits[end - (row + 1) * size:end - row * size], 2) for row in range(size)]
+
+
+def join_rows(rows, size):
+    """Сборка поля из списка строк"""
+    return int(''.join(format(row, f'0{size}b') for row in reversed(rows)), 2)
+
+
+@lru_cache(maxsize=None)
+def _spread_table(size):
+    """Байт -> его биты с шагом size (строка, ставшая столбцом)"""
+    table = []
+    for byte in range(256):
+        value = 0
+        for bit in range(8):
+            if byte >> bit & 1:
+                value |= 1 << (bit * size)
+        table.append(value)
+    return tuple(table)
+
+
+def transpose(board, size):
+    """Отражение поля относительно главной диагонали"""
+    table = _spread_table(size)
+    result = 0
+    for row, bits in enumerate(split_rows(board, size)):
+        # Восемь клеток строки за один просмотр таблицы
+        shift = row
+        while bits:
+            result |= table[bits & 0xFF] << shift
+            bits >>= 8
+            shift += 8 * size
+    return result
+
+
+def flip_vertical(board, size):
+    """Отражение поля сверху вниз (строки в обратном порядке)"""
+    return join_rows(split_rows(board, size)[::-1], size)
+
+
+def rotate_180(board, size):
+    """Поворот поля на 180 градусов: обращение порядка всех битов"""
+    return int(format(board, f'0{size * size}b')[::-1], 2)
+
+
+# Для полей до этого размера симметрии применяются по таблицам для каждого байта
+MAX_SYMMETRY_TABLE_SIZE = 10
+
+
+def _symmetries_by_rows(board, size):
+    images = []
+    for image in (board, transpose(board, size)):
+        flipped = flip_vertical(image, size)
+        images += [image, flipped, rotate_180(image, size), rotate_180(flipped, size)]
+    return images
+
+
+@lru_cache(maxsize=None)
+def _symmetry_tables(size):
+    """Для каждой симметрии и каждого байта поля: значение байта -> его образ"""
+    cells = size * size
+    images = [_symmetries_by_rows(1 << index, size) for index in range(cells)]
+    tables = []
+    for symmetry in range(8):
+        byte_tables = []
+        for start in range(0, cells, 8):
+            # Значения с битом k получаются из значений без него: table[v | 1 << k] = table[v] | образ k
+            table = [0]
+            for index in range(start, start + 8):
+                image = images[index][symmetry] if index < cells else 0
+                table += [value | image for value in table]
+            byte_tables.append(tuple(table))
+        tables.append(tuple(byte_tables))
+    return tuple(tables)
+
+
+def symmetries(board, size):
+    """Восемь образов поля под поворотами и отражениями квадрата"""
+    if size > MAX_SYMMETRY_TABLE_SIZE:
+        return _symmetries_by_rows(board, size)
+    tables = _symmetry_tables(size)
+    data = board.to_bytes(len(tables[0]), 'little')
+    images = []
+    for byte_tables in tables:
+        image = 0
+        for table, byte in zip(byte_tables, data):
+            image |= table[byte]
+        images.append(image)
+    return images
+
+
+def canonical_form(board, size):
+    """Наименьший из восьми симметричных образов поля
+    
+    Поля, переходящие друг в друга при повороте или отражении, имеют
+    одну каноническую форму.
+    """
+    return min(symmetries(board, size))
+
+
+def board_from_grid(grid):
+    """Упаковка поля из списка списков в целое число"""
+    size = len(grid)
+    board = 0
+    for row, cells in enumerate(grid):
+        for col, cell in enumerate(cells):
+            if cell:
+                board |= 1 << (row * size + col)
+    return board
+
+
+# Количество установленных битов (int.bit_count доступен начиная с Python 3.10)
+popcount = getattr(int, 'bit_count', None) or (lambda value: bin(value).count("1"))
+
+
+def iter_bits(value):
+    """Номера установленных битов числа по возрастанию"""
+    while value:
+        low = value & -value
+        yield low.bit_length() - 1
+        value ^= low
+
+
+class GridView:
+    """Ленивое представление поля только для чтения: view[row][col] -> bool"""
+
+    __slots__ = ('_game',)
+
+    def __init__(self, game):
+        self._game = game
+
+    def __len__(self):
+        return self._game.size
+
+    def __getitem__(self, row):
+        size = self._game.size
+        if not 0 <= row < size:
+            raise IndexError("row index out of range")
+        bits = (self._game.board >> (row * size)) & ((1 << size) - 1)
+        return RowView(bits, size)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def __repr__(self):
+        return repr([list(row) for row in self])
+
+
+class RowView:
+    """Строка поля только для чтения"""
+
+    __slots__ = ('_bits', '_size')
+
+    def __init__(self, bits, size):
+        self._bits = bits
+        self._size = size
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, col):
+        if not 0 <= col < self._size:
+            raise IndexError("column index out of range")
+        return bool(self._bits >> col & 1)
+
+    def __iter__(self):
+        for col in range(self._size):
+            yield bool(self._bits >> col & 1)
+
+    def __repr__(self):
+        return repr(list(self))
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Игровое поле "Выключи свет": все лампочки рисуются одним виджетом
+"""
+
+from PyQt6.QtWidgets import QWidget, QSizePolicy
+from PyQt6.QtCore import Qt, QRect, QRectF, QSize, pyqtSignal
+from PyQt6.QtGui import QBrush, QColor, QPainter, QPen, QPixmap, QRegion
+
+from config import (DEFAULT_LIGHT_COLOR, DEFAULT_DARK_COLOR, HINT_BORDER_COLOR, BORDER_COLOR,
+                    BORDER_WIDTH, HOVER_BORDER_COLOR, HOVER_BORDER_WIDTH, BUTTON_SIZE,
+                    BUTTON_SPACING, MIN_ROUND_CELL_SIZE)
+
+
+def color_ramp(dark_color, light_color, states):
+    """Цвета состояний клетки: от выключенной (0) до самой яркой (states - 1)"""
+    dark, light = QColor(dark_color), QColor(light_color)
+    colors = []
+    for state in range(states):
+        share = state / (states - 1)
+        colors.append(QColor(
+            round(dark.red() + (light.red() - dark.red()) * share),
+            round(dark.green() + (light.green() - dark.green()) * share),
+            round(dark.blue() + (light.blue() - dark.blue()) * share)).name())
+    return colors
+
+
+class BoardWidget(QWidget):
+    """Игровое поле, отрисовываемое целиком в одном paintEvent"""
+    
+    clicked_with_position = pyqtSignal(int, int)
+    
+    def __init__(self, size, parent=None):
+        super().__init__(parent)
+        self.board_size = size
+        self.grid = None
+        self.light_color = DEFAULT_LIGHT_COLOR
+        self.dark_color = DEFAULT_DARK_COLOR
+        self.states = 2
+        self._state_colors = [self.dark_color, self.light_color]  # Цвет по состоянию клетки
+        self.hint_cell = None
+        self.hover_cell = None
+        self._pressed_cell = None
+        self._dirty_cells = set()  # Клетки, ожидающие перерисовки
+        self._tiles = {}  # (цвет, цвет рамки, толщина рамки) -> QPixmap
+        self._geometry = (BUTTON_SIZE, BUTTON_SIZE + BUTTON_SPACING, 0, 0)
+        
+        self.setMouseTracking(True)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+    
+    def sizeHint(self):
+        side = self.board_size * (BUTTON_SIZE + BUTTON_SPACING) - BUTTON_SPACING
+        return QSize(side, side)
+    
+    def set_grid(self, grid, states=2):
+        """Привязка к состоянию поля (grid[row][col] - номер состояния клетки)"""
+        self.grid = grid
+        if states != self.states:
+            self.states = states
+            self._state_colors = color_ramp(self.dark_color, self.light_color, states)
+        self.update()
+    
+    def set_colors(self, light_color, dark_color):
+        """Установка цветов лампочек (перерисовывает все поле)"""
+        if (light_color, dark_color) != (self.light_color, self.dark_color):
+            self._tiles.clear()
+            self._state_colors = color_ramp(dark_color, light_color, self.states)
+        self.light_color = light_color
+        self.dark_color = dark_color
+        self.update()
+    
+    def set_hint(self, cell):
+        """Выделение клетки-подсказки (None - снять выделение)"""
+        old_cell, self.hint_cell = self.hint_cell, cell
+        self.update_cells(c for c in (old_cell, cell) if c is not None)
+    
+    def update_cells(self, cells):
+        """Перерисовка только указанных клеток (row, col)"""
+        for row, col in cells:
+            self._dirty_cells.add((row, col))
+            self.update(self.cell_rect(row, col))
+    
+    def cell_rect(self, row, col):
+        """Прямоугольник клетки в координатах виджета"""
+        cell_size, pitch, left, top = self._geometry
+        return QRect(left + col * pitch, top + row * pitch, cell_size, cell_size)
+    
+    def cell_at(self, pos):
+        """Клетка (row, col) под точкой или None, если точка между клетками"""
+        cell_size, pitch, left, top = self._geometry
+        x, y = pos.x() - left, pos.y() - top
+        if x < 0 or y < 0:
+            return None
+        row, col = int(y // pitch), int(x // pitch)
+        if row >= self.board_size or col >= self.board_size:
+            return None
+        if x - col * pitch >= cell_size or y - row * pitch >= cell_size:
+            return None
+        return row, col
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        # Клетки уменьшаются, чтобы большое поле помещалось в виджет
+        pitch = max(1, min(BUTTON_SIZE + BUTTON_SPACING, min(self.width(), self.height()) // self.board_size))
+        spacing = pitch * BUTTON_SPACING // (BUTTON_SIZE + BUTTON_SPACING)
+        cell_size = pitch - spacing
+        side = self.board_size * pitch - spacing
+        geometry = (cell_size, pitch, (self.width() - side) // 2, (self.height() - side) // 2)
+        if geometry[0] != self._geometry[0]:
+            self._tiles.clear()
+        self._geometry = geometry
+    
+    def _tile(self, color, border_color, border_width):
+        """Готовое изображение лампочки (кэшируется)"""
+        key = (color, border_color, border_width)
+        tile = self._tiles.get(key)
+        if tile is None:
+            cell_size = self._geometry[0]
+            ratio = self.devicePixelRatioF()
+            tile = QPixmap(max(1, round(cell_size * ratio)), max(1, round(cell_size * ratio)))
+            tile.setDevicePixelRatio(ratio)
+            tile.fill(Qt.GlobalColor.transparent)
+            
+            painter = QPainter(tile)
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            painter.setBrush(QBrush(QColor(color)))
+            if cell_size < MIN_ROUND_CELL_SIZE:
+                # Мелкие клетки рисуются квадратами без рамки
+                painter.setPen(Qt.PenStyle.NoPen)
+                painter.drawRect(QRectF(0, 0, cell_size, cell_size))
+            else:
+                painter.setPen(QPen(QColor(border_color), border_width))
+                inset = border_width / 2
+                painter.drawEllipse(QRectF(inset, inset, cell_size - border_width, cell_size - border_width))
+            painter.end()
+            self._tiles[key] = tile
+        return tile
+    
+    def _cell_tile(self, row, col, border_color, border_width):
+        return self._tile(self._state_colors[self.grid[row][col]], border_color, border_width)
+    
+    def paintEvent(self, event):
+        if self.grid is None:
+            return
+        cell_size, pitch, left, top = self._geometry
+        painter = QPainter(self)
+        # Готовые изображения по состоянию клетки (False/True - 0/1)
+        tiles = [self._tile(color, BORDER_COLOR, BORDER_WIDTH) for color in self._state_colors]
+        
+        dirty_cells, self._dirty_cells = self._dirty_cells, set()
+        dirty_region = QRegion()
+        for row, col in dirty_cells:
+            dirty_region = dirty_region.united(self.cell_rect(row, col))
+        
+        if dirty_cells and event.region().subtracted(dirty_region).isEmpty():
+            # Перерисовываются только изменившиеся клетки
+            for row, col in dirty_cells:
+                painter.drawPixmap(left + col * pitch, top + row * pitch, tiles[self.grid[row][col]])
+        else:
+            rect = event.rect()
+            first_row = max(0, (rect.top() - top) // pitch)
+            last_row = min(self.board_size - 1, (rect.bottom() - top) // pitch)
+            first_col = max(0, (rect.left() - left) // pitch)
+            last_col = min(self.board_size - 1, (rect.right() - left) // pitch)
+            for row in range(first_row, last_row + 1):
+                cells = self.grid[row]
+                y = top + row * pitch
+                for col in range(first_col, last_col + 1):
+                    painter.drawPixmap(left + col * pitch, y, tiles[cells[col]])
+        
+        if self.hint_cell is not None:
+            row, col = self.hint_cell
+            painter.drawPixmap(self.cell_rect(row, col).topLeft(),
+                               self._cell_tile(row, col, HINT_BORDER_COLOR, BORDER_WIDTH))
+        if self.hover_cell is not None:
+            row, col = self.hover_cell
+            painter.drawPixmap(self.cell_rect(row, col).topLeft(),
+                               self._cell_tile(row, col, HOVER_BORDER_COLOR, HOVER_BORDER_WIDTH))
+        painter.end()
+    
+    def _set_hover_cell(self, cell):
+        if cell != self.hover_cell:
+            old_cell, self.hover_cell = self.hover_cell, cell
+            self.update_cells(c for c in (old_cell, cell) if c is not None)
+    
+    def mouseMoveEvent(self, event):
+        self._set_hover_cell(self.cell_at(event.position()))
+    
+    def leaveEvent(self, event):
+        self._set_hover_cell(None)
+    
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self._pressed_cell = self.cell_at(event.position())
+    
+    def mouseReleaseEvent(self, event):
+        # Как у кнопки: щелчок засчитывается, если отпустили над той же клеткой
+        if event.button() == Qt.MouseButton.LeftButton:
+            cell = self.cell_at(event.position())
+            if cell is not None and cell == self._pressed_cell:
+                self.clicked_with_position.emit(*cell)
+            self._pressed_cell = None
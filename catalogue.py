@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Каталог выданных головоломок "Выключи свет" без повторов
+
+Головоломки, переходящие друг в друга при повороте или отражении поля,
+считаются одной: в каталог записывается каноническая форма поля
+(bitboard.canonical_form). Проверка и добавление выполняются за O(1)
+прямо в файле, отображенном в память через mmap.
+
+Каталог подключается явно: генераторы головоломок используют его, только
+если он передан (так делают главное окно и PuzzleProvider), поэтому
+сервер, пакетная обработка и сценарии не пишут файлов в data/.
+
+Формат файла (little-endian):
+    заголовок   - магическая строка, вид индекса, размер поля,
+                  емкость (бит или ячеек), число записей
+    индекс      - для полей до MAX_BITMAP_CELLS клеток битовая карта по
+                  всем значениям канонической формы (5x5 - 4 МБ при любом
+                  числе записей); для больших полей - хеш-таблица с
+                  открытой адресацией из 64-битных отпечатков формы
+"""
+
+import mmap
+import os
+import struct
+import threading
+
+from bitboard import TOPOLOGIES, canonical_form
+
+
+MAGIC = b"LOCI"
+HEADER = struct.Struct("<4sBxHQQ")
+SLOT = struct.Struct("<Q")
+
+KIND_BITMAP = 0
+KIND_HASH = 1
+
+# Поля до этого числа клеток хранятся битовой картой (2^cells бит)
+MAX_BITMAP_CELLS = 25
+
+# Начальное число ячеек хеш-таблицы и наибольшая доля занятых ячеек
+INITIAL_SLOTS = 1 << 16
+MAX_LOAD = 2 / 3
+
+CATALOGUE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def catalogue_path(size, topology_name):
+    """Путь к файлу каталога для поля заданного размера и топологии"""
+    return os.path.join(CATALOGUE_DIR, f"catalogue_{topology_name}_{size}x{size}.bin")
+
+
+def fingerprint(key, size):
+    """64-битный отпечаток канонической формы (0 зарезервирован за пустой ячейкой)"""
+    # Исключение из импортов в начале файла: hashlib нужен только для полей больше 5x5,
+    # а его импорт (с загрузкой OpenSSL) - около 8 мс из ~120 мс до первого кадра окна
+    import hashlib
+    digest = hashlib.blake2b(key.to_bytes((size * size + 7) // 8, "little"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class PuzzleCatalogue:
+    """Множество канонических форм полей в файле, отображенном в память
+
+    Доступ защищен блокировкой: головоломки генерируются в пуле потоков
+    PuzzleProvider, а хеш-таблица при росте переоткрывается.
+    """
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self._lock = threading.Lock()
+        if not os.path.exists(path):
+            self._create(path, size)
+        self._open()
+        if self._size != size:
+            self.close()
+            raise ValueError(f"{path}: каталог для поля {self._size}x{self._size}, а не {size}x{size}")
+
+    @staticmethod
+    def _create(path, size, slots=INITIAL_SLOTS):
+        cells = size * size
+        if cells <= MAX_BITMAP_CELLS:
+            kind, capacity, length = KIND_BITMAP, 1 << cells, (1 << cells) // 8 or 1
+        else:
+            kind, capacity, length = KIND_HASH, slots, slots * SLOT.size
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, kind, size, capacity, 0))
+            # Файл создается разреженным: нули не записываются на диск
+            file.truncate(HEADER.size + length)
+
+    def _open(self):
+        with open(self.path, "r+b") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0)
+        magic, self._kind, self._size, self._capacity, self._count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{self.path}: не файл каталога головоломок")
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, board):
+        key = canonical_form(board, self.size)
+        with self._lock:
+            if self._kind == KIND_BITMAP:
+                return bool(self._mmap[HEADER.size + (key >> 3)] >> (key & 7) & 1)
+            return self._find(fingerprint(key, self.size))[1]
+
+    def add(self, board):
+        """Добавление поля: True, если ни оно, ни его симметричные образы еще не встречались"""
+        key = canonical_form(board, self.size)
+        with self._lock:
+            if self._kind == KIND_BITMAP:
+                position = HEADER.size + (key >> 3)
+                byte = self._mmap[position]
+                if byte >> (key & 7) & 1:
+                    return False
+                self._mmap[position] = byte | 1 << (key & 7)
+            else:
+                mark = fingerprint(key, self.size)
+                slot, found = self._find(mark)
+                if found:
+                    return False
+                SLOT.pack_into(self._mmap, HEADER.size + slot * SLOT.size, mark)
+            self._count += 1
+            HEADER.pack_into(self._mmap, 0, MAGIC, self._kind, self.size, self._capacity, self._count)
+            if self._kind == KIND_HASH and self._count > self._capacity * MAX_LOAD:
+                self._grow()
+        return True
+
+    def discard(self, board):
+        """Удаление поля (например, подготовленного, но так и не выданного игроку)"""
+        key = canonical_form(board, self.size)
+        with self._lock:
+            if self._kind == KIND_BITMAP:
+                position = HEADER.size + (key >> 3)
+                byte = self._mmap[position]
+                if not byte >> (key & 7) & 1:
+                    return False
+                self._mmap[position] = byte & ~(1 << (key & 7))
+            else:
+                slot, found = self._find(fingerprint(key, self.size))
+                if not found:
+                    return False
+                self._remove_slot(slot)
+            self._count -= 1
+            HEADER.pack_into(self._mmap, 0, MAGIC, self._kind, self.size, self._capacity, self._count)
+        return True
+
+    def _slot(self, slot):
+        return SLOT.unpack_from(self._mmap, HEADER.size + slot * SLOT.size)[0]
+
+    def _find(self, mark):
+        """Ячейка с отпечатком или первая пустая ячейка: (номер, найден ли отпечаток)"""
+        return _probe(self._mmap, self._capacity, mark)
+
+    def _remove_slot(self, slot):
+        """Освобождение ячейки со сдвигом следующих за ней отпечатков (без "надгробий")
+
+        Отпечаток из ячейки current переносится в освобожденную ячейку, если
+        его исходная ячейка не лежит циклически в (free, current]: иначе поиск
+        остановился бы на пустой ячейке раньше, чем дошел до него.
+        """
+        capacity = self._capacity
+        free = slot
+        current = (slot + 1) % capacity
+        while True:
+            mark = self._slot(current)
+            if not mark:
+                break
+            home = mark % capacity
+            if (current - home) % capacity >= (current - free) % capacity:
+                SLOT.pack_into(self._mmap, HEADER.size + free * SLOT.size, mark)
+                free = current
+            current = (current + 1) % capacity
+        SLOT.pack_into(self._mmap, HEADER.size + free * SLOT.size, 0)
+
+    def _grow(self):
+        """Перенос отпечатков в таблицу вдвое большей емкости за один проход
+
+        Новая таблица заполняется прямо из отображения старой, без копии
+        всех отпечатков в памяти.
+        """
+        temporary = self.path + ".tmp"
+        capacity = self._capacity * 2
+        self._create(temporary, self.size, capacity)
+        with open(temporary, "r+b") as file:
+            target = mmap.mmap(file.fileno(), 0)
+        try:
+            with memoryview(self._mmap)[HEADER.size:] as slots:
+                for (mark,) in struct.iter_unpack("<Q", slots):
+                    if mark:
+                        slot, _ = _probe(target, capacity, mark)
+                        SLOT.pack_into(target, HEADER.size + slot * SLOT.size, mark)
+            HEADER.pack_into(target, 0, MAGIC, self._kind, self.size, capacity, self._count)
+            target.flush()
+        finally:
+            target.close()
+        self._mmap.close()
+        os.replace(temporary, self.path)
+        self._open()
+
+    def flush(self):
+        """Сброс изменений на диск"""
+        self._mmap.flush()
+
+    def close(self):
+        """Закрытие отображения файла"""
+        self._mmap.close()
+
+
+def _probe(buffer, capacity, mark):
+    """Линейное пробирование хеш-таблицы в buffer: (ячейка, найден ли отпечаток)"""
+    slot = mark % capacity
+    while True:
+        value = SLOT.unpack_from(buffer, HEADER.size + slot * SLOT.size)[0]
+        if value == mark:
+            return slot, True
+        if not value:
+            return slot, False
+        slot = (slot + 1) % capacity
+
+
+# Открытые каталоги: один объект (и одна блокировка) на файл для всех потоков
+_catalogues = {}
+_catalogues_lock = threading.Lock()
+
+
+def get_catalogue(size, topology):
+    """Каталог для поля заданного размера и топологии (кэшируется) или None
+
+    Каталог ведется только для встроенных топологий: они симметричны
+    относительно поворотов и отражений, поэтому симметричные поля - это
+    одна и та же головоломка. Если файл каталога нельзя создать или
+    открыть (например, игра установлена только для чтения), возвращается
+    None и головоломки выдаются без проверки повторов.
+    """
+    with _catalogues_lock:
+        key = (size, topology)
+        if key not in _catalogues:
+            _catalogues[key] = _open_catalogue(size, topology)
+        return _catalogues[key]
+
+
+def _open_catalogue(size, topology):
+    for name, known in TOPOLOGIES.items():
+        if known == topology:
+            try:
+                return PuzzleCatalogue(catalogue_path(size, name), size)
+            except OSError:
+                return None
+    return None
@@ -7,27 +7,25 @@
 WINDOW_WIDTH = 400
 WINDOW_HEIGHT = 500
 
-# Размеры кнопок
+# Размеры лампочек
 BUTTON_SIZE = 50
+BUTTON_SPACING = 6
+MIN_ROUND_CELL_SIZE = 8  # Клетки меньше рисуются квадратами без рамки
 
 # Цвета по умолчанию
 DEFAULT_LIGHT_COLOR = "#ffff00"  # Желтый
 DEFAULT_DARK_COLOR = "#808080"   # Серый
+HINT_BORDER_COLOR = "#ff0000"    # Красный
+
+# Рамка лампочки (при наведении - синяя и толще)
+BORDER_COLOR = "#000000"
+BORDER_WIDTH = 2
+HOVER_BORDER_COLOR = "#0000ff"
+HOVER_BORDER_WIDTH = 3
 
 # Размер игрового поля
 GRID_SIZE = 5
-
-# Стили
-BUTTON_STYLE = """
-QPushButton {{
-    background-color: {color};
-    border: 2px solid black;
-    border-radius: 25px;
-}}
-QPushButton:hover {{
-    border: 3px solid blue;
-}}
-"""
+BOARD_SIZES = (3, 4, 5, 6, 7, 10, 20, 50, 100)
 
 # Правила игры (HTML)
 RULES_HTML = """
@@ -57,13 +55,41 @@ RULES_HTML = """
 </ul>
 """
 
-# Уровни сложности
+# Уровни сложности: диапазон длины оптимального решения (число нажатий)
 DIFFICULTY_LEVELS = {
     'Легкий': (2, 4),
-    'Средний': (5, 10),
-    'Сложный': (10, 20),
-    'Эксперт': (20, 30)
+    'Средний': (5, 8),
+    'Сложный': (9, 12),
+    'Эксперт': (13, 15)
 }
 
+# Очередь готовых головоломок: размер на каждый уровень и число потоков
+PUZZLE_QUEUE_SIZE = 3
+PUZZLE_WORKERS = 2
+
+# Игровой сервер: адрес, число сессий в памяти и файл для вытесненных сессий
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+MAX_SESSIONS = 10000
+SESSION_STORE_PATH = "sessions.db"
+
 # Направления для соседних клеток
-DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]  # вверх, вниз, влево, вправо
\ No newline at end of file
+DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]  # вверх, вниз, влево, вправо
+DIAGONAL_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+# Названия топологий поля (см. bitboard.TOPOLOGIES)
+TOPOLOGY_NAMES = {
+    'plus': 'Крест',
+    'torus': 'Крест на торе',
+    'moore': '8 соседей',
+    'moore-torus': '8 соседей на торе'
+}
+# Число состояний клетки: 2 - классическая игра, больше - нажатие прибавляет 1 по модулю k
+STATE_COUNTS = (2, 3, 4, 5, 6)
+
+# Кадр окна: поле перерисовывается и победа проверяется не чаще раза за кадр
+FRAME_INTERVAL_MS = 16
+# Показ решения: нажатий в секунду; длинные решения ускоряются, чтобы показ
+# занимал не больше AUTO_SOLVE_MAX_SECONDS
+AUTO_SOLVE_RATE = 20
+AUTO_SOLVE_MAX_SECONDS = 10
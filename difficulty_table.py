@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Таблица оптимальной длины решения для всех разрешимых полей
+
+Таблица строится один раз (python difficulty_table.py) и хранится в
+файле, который открывается через mmap и не загружается в память целиком.
+Для небольших полей (до MAX_ENUMERATED_CELLS клеток) таблица любой
+топологии строится в памяти при первом обращении.
+
+Формат файла (little-endian):
+    заголовок   - магическая строка, размер поля, число длин L, число полей
+    смещения    - L + 1 чисел uint32: поля с длиной решения d занимают
+                  записи с offsets[d] по offsets[d + 1] - 1
+    поля        - битовые маски полей (uint32), отсортированные по длине
+"""
+
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+from array import array
+from functools import lru_cache
+
+from bitboard import DEFAULT_TOPOLOGY, popcount, toggle_masks
+from solver import get_solver
+
+
+MAGIC = b"LOTB"
+HEADER = struct.Struct("<4sHHI")
+ENTRY = struct.Struct("<I")
+
+# Поле хранится в одном uint32, поэтому таблица строится для полей до 32 клеток
+MAX_CELLS = 32
+
+# Для полей до этого числа клеток таблица без файла строится в памяти (2^16 полей - доли секунды)
+MAX_ENUMERATED_CELLS = 16
+
+TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def table_path(size):
+    """Путь к файлу таблицы для поля заданного размера"""
+    return os.path.join(TABLE_DIR, f"difficulty_{size}x{size}.bin")
+
+
+def iter_solvable(size, topology=DEFAULT_TOPOLOGY):
+    """Все разрешимые поля по одному разу: (поле, длина оптимального решения)"""
+    masks = toggle_masks(size, topology)
+    null_space = get_solver(size, topology).null_space
+
+    # Нажатия, маски которых образуют базис образа матрицы переключений
+    basis_presses = []
+    echelon = {}
+    for press, mask in enumerate(masks):
+        reduced = mask
+        while reduced:
+            top = reduced.bit_length() - 1
+            if top not in echelon:
+                echelon[top] = reduced
+                basis_presses.append(press)
+                break
+            reduced ^= echelon[top]
+
+    # Все элементы ядра: решения поля отличаются ровно на них
+    kernel = [0]
+    for vector in null_space:
+        kernel += [element ^ vector for element in kernel]
+
+    # Перебор образа в порядке кода Грея: каждое поле встречается один раз
+    board = presses = 0
+    yield 0, 0
+    for i in range(1, 1 << len(basis_presses)):
+        press = basis_presses[(i & -i).bit_length() - 1]
+        board ^= masks[press]
+        presses ^= 1 << press
+        yield board, min(popcount(presses ^ element) for element in kernel)
+
+
+def table_bytes(size, topology=DEFAULT_TOPOLOGY):
+    """Содержимое таблицы: все разрешимые поля с длиной оптимального решения"""
+    if size * size > MAX_CELLS:
+        raise ValueError(f"Таблица поддерживает поля не более {MAX_CELLS} клеток")
+    buckets = [array("I") for _ in range(size * size + 1)]
+    for board, length in iter_solvable(size, topology):
+        buckets[length].append(board)
+
+    while len(buckets) > 1 and not buckets[-1]:
+        buckets.pop()
+
+    offsets = array("I", [0])
+    for bucket in buckets:
+        offsets.append(offsets[-1] + len(bucket))
+    if sys.byteorder != "little":
+        offsets.byteswap()
+        for bucket in buckets:
+            bucket.byteswap()
+
+    data = bytearray(HEADER.pack(MAGIC, size, len(buckets), offsets[-1]))
+    data += offsets.tobytes()
+    for bucket in buckets:
+        data += bucket.tobytes()
+    return bytes(data)
+
+
+def build_table(size, path=None):
+    """Построение файла таблицы для поля со стандартным соседством"""
+    path = path or table_path(size)
+    data = table_bytes(size)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(data)
+    return path
+
+
+class DifficultyTable:
+    """Таблица длин решений, отображенная в память (или готовая в buffer)"""
+
+    def __init__(self, path=None, buffer=None):
+        if buffer is None:
+            with open(path, "rb") as file:
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mmap = buffer
+        magic, self.size, lengths, self.count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: не файл таблицы сложности")
+        self._offsets = struct.unpack_from(f"<{lengths + 1}I", self._mmap, HEADER.size)
+        self._data_start = HEADER.size + 4 * (lengths + 1)
+
+    @property
+    def max_length(self):
+        """Наибольшая длина оптимального решения"""
+        return len(self._offsets) - 2
+
+    def count_with_length(self, length):
+        """Количество полей с заданной длиной оптимального решения"""
+        if not 0 <= length <= self.max_length:
+            return 0
+        return self._offsets[length + 1] - self._offsets[length]
+
+    @property
+    def buffer(self):
+        """Буфер таблицы (записи начинаются с data_offset)"""
+        return self._mmap
+
+    @property
+    def data_offset(self):
+        """Смещение первой записи от начала файла"""
+        return self._data_start
+
+    def index_range(self, min_length, max_length):
+        """Диапазон номеров записей [start, end) с длиной решения в [min_length, max_length]"""
+        min_length = max(min_length, 0)
+        max_length = min(max_length, self.max_length)
+        if min_length > max_length:
+            return 0, 0
+        return self._offsets[min_length], self._offsets[max_length + 1]
+
+    def sample(self, min_length, max_length, rng=random):
+        """Случайное поле с длиной решения в [min_length, max_length] или None"""
+        start, end = self.index_range(min_length, max_length)
+        if start == end:
+            return None
+        index = rng.randrange(start, end)
+        return ENTRY.unpack_from(self._mmap, self._data_start + 4 * index)[0]
+
+    def close(self):
+        """Закрытие отображения файла"""
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+
+
+@lru_cache(maxsize=None)
+def get_table(size, topology=DEFAULT_TOPOLOGY, use_files=True):
+    """Таблица для поля заданного размера и топологии или None
+
+    Файл таблицы строится только для стандартного соседства; таблица
+    небольшого поля без файла строится в памяти. С use_files=False файл
+    не читается, и результат не зависит от того, построена ли таблица.
+    """
+    if use_files and topology == DEFAULT_TOPOLOGY:
+        path = table_path(size)
+        if os.path.exists(path):
+            return DifficultyTable(path)
+    if size * size <= MAX_ENUMERATED_CELLS:
+        return DifficultyTable(buffer=table_bytes(size, topology))
+    return None
+
+
+def max_solution_length(size, topology=DEFAULT_TOPOLOGY, use_files=True):
+    """Наибольшая длина оптимального решения на поле или None, если она неизвестна"""
+    table = get_table(size, topology, use_files)
+    return table.max_length if table is not None else None
+
+
+def main():
+    """Построение таблицы из командной строки"""
+    parser = argparse.ArgumentParser(description="Построение таблицы сложности")
+    parser.add_argument("--size", type=int, default=5, help="размер поля")
+    parser.add_argument("--output", help="путь к файлу таблицы")
+    args = parser.parse_args()
+
+    path = build_table(args.size, args.output)
+    table = DifficultyTable(path)
+    print(f"{path}: {table.count} полей")
+    for length in range(table.max_length + 1):
+        print(f"  {length:2d} нажатий: {table.count_with_length(length)}")
+    table.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,19 +3,120 @@
 Логика игры "Выключи свет" (Lights Out)
 """
 
+import datetime
 import random
-from config import DIFFICULTY_LEVELS, DIRECTIONS, GRID_SIZE
+from array import array
+from config import DIFFICULTY_LEVELS, GRID_SIZE
+from bitboard import DEFAULT_TOPOLOGY, GridView, iter_bits, popcount, toggle_indices, toggle_masks
+from solver import get_modular_solver, get_solver
+from difficulty_table import get_table, max_solution_length
+
+
+# Сколько раз генерировать поле заново, если оно уже есть в каталоге
+MAX_UNIQUE_ATTEMPTS = 32
+
+# Сколько случайных полей проверять, подбирая длину оптимального решения без таблицы;
+# при ядре размерности d поиск решения перебирает 2^d наборов, поэтому попыток
+# не больше MAX_DIFFICULTY_WORK >> d
+MAX_DIFFICULTY_ATTEMPTS = 64
+MAX_DIFFICULTY_WORK = 1 << 14
+
+
+def difficulty_range(size, min_moves, max_moves, topology=DEFAULT_TOPOLOGY, use_files=True):
+    """Диапазон длины решения, ограниченный наибольшей длиной, возможной на поле
+    
+    Например, на поле 4 x 4 любое разрешимое поле гасится за 7 нажатий,
+    поэтому уровни с длиной от 9 сводятся к самым длинным решениям.
+    """
+    limit = max_solution_length(size, topology, use_files)
+    if limit is None:
+        return min_moves, max_moves
+    return min(min_moves, limit), min(max_moves, limit)
+
+
+def generate_board(size, min_moves, max_moves, rng=random, topology=DEFAULT_TOPOLOGY, catalogue=None,
+                   use_files=True):
+    """Случайное разрешимое поле с длиной решения из [min_moves, max_moves]
+    
+    Возвращает (поле, оптимальное решение). Диапазон ограничивается
+    наибольшей длиной, возможной на поле (difficulty_range). С каталогом
+    catalogue поля, уже выдававшиеся с точностью до поворотов и отражений,
+    отбрасываются (пока есть попытки), а новое поле добавляется в каталог.
+    С use_files=False файл таблицы сложности не читается: поле зависит
+    только от rng, а не от того, построена ли таблица на этой машине.
+    """
+    min_moves, max_moves = difficulty_range(size, min_moves, max_moves, topology, use_files)
+    for _ in range(MAX_UNIQUE_ATTEMPTS):
+        board, solution = _random_board(size, min_moves, max_moves, rng, topology, use_files)
+        if catalogue is None or catalogue.add(board):
+            break
+    return board, solution
+
+
+def _random_board(size, min_moves, max_moves, rng, topology, use_files):
+    solver = get_solver(size, topology)
+    
+    # Если таблица есть, выбираем поле с нужной длиной оптимального решения
+    table = get_table(size, topology, use_files)
+    board = table.sample(min_moves, max_moves, rng) if table is not None else None
+    if board is not None:
+        return board, solver.solve_optimal(board)
+    
+    # Иначе нажимаем случайные различные клетки и проверяем длину оптимального
+    # решения: при нетривиальном ядре часть нажатий сокращается
+    masks = toggle_masks(size, topology)
+    cells = size * size
+    attempts = max(1, min(MAX_DIFFICULTY_ATTEMPTS, MAX_DIFFICULTY_WORK >> (cells - solver.rank)))
+    best = None
+    for _ in range(attempts):
+        board = presses = 0
+        for index in rng.sample(range(cells), min(rng.randint(min_moves, max_moves), cells)):
+            board ^= masks[index]
+            presses |= 1 << index
+        solution = solver.solve_optimal(board)
+        # Для большого ядра решение не точное: нажатия генератора могут быть короче
+        if popcount(presses) < popcount(solution):
+            solution = presses
+        length = popcount(solution)
+        if min_moves <= length <= max_moves:
+            return board, solution
+        # Если попытки кончатся, берем поле с длиной ближе всего к диапазону
+        distance = min_moves - length if length < min_moves else length - max_moves
+        if best is None or distance < best[0]:
+            best = (distance, board, solution)
+    return best[1], best[2]
+
+
+def move_log_typecode(size):
+    """Тип элементов журнала ходов: 'H' (2 байта), если номера клеток помещаются"""
+    return 'H' if size * size <= 1 << 16 else 'I'
 
 
 class Game:
     """Класс для логики игры 'Выключи свет'"""
     
-    def __init__(self, difficulty='Средний'):
+    # Без __dict__: сервер держит в памяти тысячи сессий
+    __slots__ = ('_difficulty', '_size', '_topology', '_min_moves', '_max_moves', '_masks', '_board',
+                 '_rendered_board', '_grid_view', '_moves', '_solution', '_initial_board',
+                 '_history', '_redo')
+    
+    def __init__(self, difficulty='Средний', size=GRID_SIZE, topology=DEFAULT_TOPOLOGY):
+        if size < 1:
+            raise ValueError(f"Некорректный размер поля: {size}")
         self._difficulty = difficulty
-        self._size = GRID_SIZE  # Фиксированный размер из конфигурации
+        self._size = size
+        self._topology = topology  # Соседство клеток (bitboard.Topology)
         self._min_moves, self._max_moves = DIFFICULTY_LEVELS[difficulty]
-        self._grid = [[False for _ in range(self._size)] for _ in range(self._size)]
+        # Маски переключения по клеткам: любая топология компилируется один раз
+        self._masks = toggle_masks(self._size, topology)
+        self._board = 0  # Бит row * size + col - состояние клетки (row, col)
+        self._rendered_board = 0  # Поле на момент последней отрисовки
+        self._grid_view = GridView(self)
         self._moves = 0
+        self._solution = 0  # Нажатия, гасящие текущее поле (None - решения нет)
+        self._initial_board = 0  # Поле в начале игры (для записи и повтора)
+        self._history = array(move_log_typecode(size))  # Номера нажатых клеток
+        self._redo = array(move_log_typecode(size))  # Отмененные ходы
         
     @property
     def difficulty(self):
@@ -27,68 +128,389 @@ class Game:
         """Размер игрового поля"""
         return self._size
     
+    @property
+    def topology(self):
+        """Соседство клеток"""
+        return self._topology
+    
+    @property
+    def board(self):
+        """Состояние игрового поля в виде битовой маски"""
+        return self._board
+    
     @property
     def grid(self):
-        """Состояние игрового поля"""
-        return self._grid
+        """Состояние игрового поля (только для чтения): grid[row][col]"""
+        return self._grid_view
     
     @property
     def moves(self):
         """Количество ходов"""
         return self._moves
     
+    @property
+    def initial_board(self):
+        """Поле в начале игры в виде битовой маски"""
+        return self._initial_board
+    
+    @property
+    def history(self):
+        """Копия журнала ходов: номера клеток row * size + col"""
+        return array(self._history.typecode, self._history)
+    
+    @property
+    def can_undo(self):
+        """Есть ли ход для отмены"""
+        return bool(self._history)
+    
+    @property
+    def can_redo(self):
+        """Есть ли отмененный ход для повтора"""
+        return bool(self._redo)
+    
+    @property
+    def states(self):
+        """Число состояний клетки"""
+        return 2
+    
     @property
     def is_solved(self):
         """Проверка, решена ли головоломка"""
-        return all(not cell for row in self._grid for cell in row)
+        return self._board == 0
+    
+    @property
+    def state(self):
+        """Компактное состояние игры: (difficulty, size, board, moves, solution, topology)"""
+        return self._difficulty, self._size, self._board, self._moves, self._solution, self._topology
     
-    def reset_game(self, difficulty=None):
-        """Сброс игры с новым уровнем сложности"""
+    @classmethod
+    def from_state(cls, state):
+        """Восстановление игры из state"""
+        difficulty, size, board, moves, solution, topology = state
+        game = cls(difficulty, size, topology)
+        game._board = game._rendered_board = game._initial_board = board
+        game._moves = moves
+        game._solution = solution
+        return game
+    
+    def reset_game(self, difficulty=None, board=None, solution=None, rng=None, catalogue=None):
+        """Сброс игры с новым уровнем сложности
+        
+        Готовое поле (например, из очереди PuzzleProvider) можно передать
+        в board вместе с его решением solution, тогда генерация не нужна.
+        Генератор rng делает новую головоломку воспроизводимой, а каталог
+        catalogue (catalogue.get_catalogue) исключает повторы.
+        """
         if difficulty and difficulty in DIFFICULTY_LEVELS:
             self._difficulty = difficulty
             self._min_moves, self._max_moves = DIFFICULTY_LEVELS[difficulty]
-        self._grid = [[False for _ in range(self._size)] for _ in range(self._size)]
         self._moves = 0
-        self.generate_puzzle()
+        del self._history[:]
+        del self._redo[:]
+        if board is None:
+            self.generate_puzzle(rng, catalogue)
+        else:
+            self._board = board
+            if solution is None:
+                solution = self._optimal_solution(board)
+            self._solution = solution
+        self._initial_board = self._board
     
-    def generate_puzzle(self):
-        """Генерация случайной головоломки в зависимости от уровня сложности"""
-        # Используем параметры сложности для генерации
-        random_moves = random.randint(self._min_moves, self._max_moves)
-        for _ in range(random_moves):
-            row = random.randint(0, self._size - 1)
-            col = random.randint(0, self._size - 1)
-            self._toggle_lights(row, col, count_move=False)
+    def reset_daily(self, day=None):
+        """Головоломка дня: одна и та же для всех игроков в день day (по умолчанию сегодня)"""
+        if day is None:
+            day = datetime.date.today()
+        seed = f"{day.isoformat()}/{self._size}/{self.states}/{self._difficulty}/{self._topology}"
+        self.reset_game(rng=random.Random(seed))
+    
+    def generate_puzzle(self, rng=None, catalogue=None):
+        """Генерация случайной головоломки в зависимости от уровня сложности
+        
+        Если передан каталог catalogue, уже выдававшиеся головоломки
+        отсеиваются по нему; без каталога головоломка зависит только от rng.
+        С rng файл таблицы сложности не используется, поэтому головоломка
+        (например, головоломка дня) одна и та же на всех машинах.
+        """
+        # Полное решение только здесь, дальше оно обновляется в каждом ходе
+        self._board, self._solution = generate_board(self._size, self._min_moves, self._max_moves,
+                                                     rng or random, self._topology, catalogue,
+                                                     use_files=rng is None)
+    
+    def _optimal_solution(self, board):
+        """Решение поля с наименьшим числом нажатий или None"""
+        return get_solver(self._size, self._topology).solve_optimal(board)
     
     def make_move(self, row, col):
         """Совершение хода"""
         if 0 <= row < self._size and 0 <= col < self._size:
             self._toggle_lights(row, col, count_move=True)
+            if self._redo:
+                del self._redo[:]
             return True
         return False
     
+    def undo(self):
+        """Отмена последнего хода (повторное нажатие той же клетки)
+        
+        Возвращает клетку (row, col) отмененного хода или None.
+        """
+        if not self._history:
+            return None
+        index = self._history.pop()
+        self._redo.append(index)
+        cell = divmod(index, self._size)
+        self._untoggle_lights(*cell)
+        self._moves -= 1
+        return cell
+    
+    def redo(self):
+        """Повтор последнего отмененного хода: клетка (row, col) или None"""
+        if not self._redo:
+            return None
+        cell = divmod(self._redo.pop(), self._size)
+        self._toggle_lights(*cell, count_move=True)
+        return cell
+    
+    def pop_changed_cells(self):
+        """Клетки (row, col), изменившиеся с прошлого вызова (для отрисовки)"""
+        changed = self._board ^ self._rendered_board
+        self._rendered_board = self._board
+        return [divmod(index, self._size) for index in iter_bits(changed)]
+    
+    def hint(self):
+        """Следующая рекомендуемая клетка (row, col) или None"""
+        if not self._solution:
+            return None
+        index = (self._solution & -self._solution).bit_length() - 1
+        return divmod(index, self._size)
+    
+    def solve(self, optimal=False):
+        """Набор клеток (row, col), гасящий поле, или None, если решения нет
+        
+        При optimal=True возвращается решение с наименьшим числом нажатий.
+        """
+        solver = get_solver(self._size, self._topology)
+        presses = solver.solve_optimal(self._board) if optimal else solver.solve(self._board)
+        if presses is None:
+            return None
+        return {divmod(index, self._size) for index in iter_bits(presses)}
+    
+    def press_sequence(self, optimal=False):
+        """Нажатия решения по порядку строк [(row, col), ...] или None, если решения нет"""
+        presses = self.solve(optimal)
+        return None if presses is None else sorted(presses)
+    
     def _toggle_lights(self, row, col, count_move=True):
         """Переключение света в клетке и соседних клетках"""
+        index = row * self._size + col
         if count_move:
             self._moves += 1
+            self._history.append(index)
             
-        # Переключаем центральную клетку
-        self._grid[row][col] = not self._grid[row][col]
+        # Маска уже содержит клетку и всех её соседей с учетом границ поля
+        self._board ^= self._masks[index]
         
-        # Переключаем соседние клетки (вверх, вниз, влево, вправо)
-        for dr, dc in DIRECTIONS:
-            new_row, new_col = row + dr, col + dc
-            if 0 <= new_row < self._size and 0 <= new_col < self._size:
-                self._grid[new_row][new_col] = not self._grid[new_row][new_col]
+        # Игра линейна: нажатие меняет в решении только бит этой клетки
+        if self._solution is not None:
+            self._solution ^= 1 << index
+    
+    def _untoggle_lights(self, row, col):
+        """Отмена нажатия клетки: при двух состояниях - то же нажатие"""
+        self._toggle_lights(row, col, count_move=False)
     
     @staticmethod
-    def get_cell_neighbors(row, col, size):
-        """Получение координат соседних клеток"""
-        neighbors = [(row, col)]  # Центральная клетка
+    def get_cell_neighbors(row, col, size, topology=DEFAULT_TOPOLOGY):
+        """Получение координат соседних клеток (включая саму клетку)"""
+        return topology.neighbours(row, col, size)
+
+
+
+def generate_modular_board(size, states, min_moves, max_moves, rng=random, topology=DEFAULT_TOPOLOGY):
+    """Случайное поле игры с states состояниями: (поле, нажатия, гасящие его)
+    
+    Нажимаются различные клетки, каждая от 1 до states - 1 раз; решение -
+    дополнение этих нажатий до states.
+    """
+    cells = size * size
+    indices = toggle_indices(size, topology)
+    board = bytearray(cells)
+    solution = bytearray(cells)
+    for index in rng.sample(range(cells), min(rng.randint(min_moves, max_moves), cells)):
+        presses = rng.randint(1, states - 1)
+        solution[index] = states - presses
+        for cell in indices[index]:
+            board[cell] = (board[cell] + presses) % states
+    return board, solution
+
+
+def create_game(difficulty='Средний', size=GRID_SIZE, topology=DEFAULT_TOPOLOGY, states=2):
+    """Игра с двумя (Game) или большим числом состояний клетки (ModularGame)"""
+    if states == 2:
+        return Game(difficulty, size, topology)
+    return ModularGame(difficulty, size, topology, states)
+
+
+class ModularGridView:
+    """Поле игры с k состояниями только для чтения: view[row][col] -> int"""
+    
+    __slots__ = ('_game',)
+    
+    def __init__(self, game):
+        self._game = game
+    
+    def __len__(self):
+        return self._game.size
+    
+    def __getitem__(self, row):
+        size = self._game.size
+        if not 0 <= row < size:
+            raise IndexError("row index out of range")
+        return bytes(self._game._board[row * size:(row + 1) * size])
+    
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+    
+    def __repr__(self):
+        return repr([list(row) for row in self])
+
+
+class ModularGame(Game):
+    """Игра с k состояниями клетки: нажатие прибавляет 1 по модулю k
+    
+    Поле хранится в bytearray (по байту на клетку), решение - в bytearray
+    с числом оставшихся нажатий каждой клетки. Игра с двумя состояниями
+    остается в классе Game с битовым полем.
+    """
+    
+    __slots__ = ('_states', '_indices', '_lit')
+    
+    def __init__(self, difficulty='Средний', size=GRID_SIZE, topology=DEFAULT_TOPOLOGY, states=3):
+        if states < 2 or states > 255:
+            raise ValueError(f"Некорректное число состояний: {states}")
+        # Проверка размера поля и подготовка решателя до создания игры
+        get_modular_solver(size, states, topology)
+        super().__init__(difficulty, size, topology)
+        self._states = states
+        self._indices = toggle_indices(size, topology)
+        cells = size * size
+        self._board = bytearray(cells)  # Байт row * size + col - состояние клетки
+        self._rendered_board = bytes(cells)
+        self._grid_view = ModularGridView(self)
+        self._solution = bytearray(cells)
+        self._initial_board = bytes(cells)
+        self._lit = 0  # Число горящих клеток (ненулевых состояний)
         
-        for dr, dc in DIRECTIONS:
-            new_row, new_col = row + dr, col + dc
-            if 0 <= new_row < size and 0 <= new_col < size:
-                neighbors.append((new_row, new_col))
+    @property
+    def states(self):
+        """Число состояний клетки"""
+        return self._states
+    
+    @property
+    def board(self):
+        """Состояние игрового поля: байт на клетку"""
+        return bytes(self._board)
+    
+    @property
+    def is_solved(self):
+        """Проверка, решена ли головоломка"""
+        return self._lit == 0
+    
+    @property
+    def state(self):
+        """Компактное состояние игры: (difficulty, size, board, moves, solution, topology, states)"""
+        solution = bytes(self._solution) if self._solution is not None else None
+        return (self._difficulty, self._size, bytes(self._board), self._moves, solution,
+                self._topology, self._states)
+    
+    @classmethod
+    def from_state(cls, state):
+        """Восстановление игры из state"""
+        difficulty, size, board, moves, solution, topology, states = state
+        game = cls(difficulty, size, topology, states)
+        game.reset_game(board=board, solution=solution)
+        game._rendered_board = bytes(board)
+        game._moves = moves
+        return game
+    
+    def reset_game(self, difficulty=None, board=None, solution=None, rng=None, catalogue=None):
+        """Сброс игры с новым уровнем сложности (board - байты состояний клеток)"""
+        if board is not None:
+            board = bytearray(board)
+            if solution is None:
+                solution = self._optimal_solution(board)
+            solution = bytearray(solution) if solution is not None else None
+        super().reset_game(difficulty, board, solution, rng, catalogue)
+        self._initial_board = bytes(self._board)
+        self._lit = len(self._board) - self._board.count(0)
+    
+    def generate_puzzle(self, rng=None, catalogue=None):
+        """Генерация случайной головоломки в зависимости от уровня сложности
+        
+        Каталог ведется только для полей с двумя состояниями, поэтому catalogue не используется.
+        """
+        self._board, self._solution = generate_modular_board(
+            self._size, self._states, self._min_moves, self._max_moves, rng or random, self._topology)
+    
+    def _optimal_solution(self, board):
+        """Решение поля (число нажатий каждой клетки) или None
+        
+        Перебор ядра над Z/kZ не выполняется, поэтому решение не обязательно
+        наименьшее.
+        """
+        return get_modular_solver(self._size, self._states, self._topology).solve(board)
+    
+    def pop_changed_cells(self):
+        """Клетки (row, col), изменившиеся с прошлого вызова (для отрисовки)"""
+        board, rendered = self._board, self._rendered_board
+        changed = [divmod(index, self._size) for index in range(len(board)) if board[index] != rendered[index]]
+        self._rendered_board = bytes(board)
+        return changed
+    
+    def hint(self):
+        """Следующая рекомендуемая клетка (row, col) или None"""
+        if self._solution is None:
+            return None
+        for index, presses in enumerate(self._solution):
+            if presses:
+                return divmod(index, self._size)
+        return None
+    
+    def solve(self, optimal=False):
+        """Число нажатий для каждой клетки {(row, col): n}, гасящее поле, или None"""
+        presses = self._optimal_solution(self._board)
+        if presses is None:
+            return None
+        return {divmod(index, self._size): count for index, count in enumerate(presses) if count}
+    
+    def press_sequence(self, optimal=False):
+        """Нажатия решения по порядку строк; клетка повторяется столько раз, сколько ее нужно нажать"""
+        presses = self.solve(optimal)
+        if presses is None:
+            return None
+        return [cell for cell, count in sorted(presses.items()) for _ in range(count)]
+    
+    def _toggle_lights(self, row, col, count_move=True):
+        """Увеличение состояния клетки и соседних клеток на 1 по модулю k"""
+        index = row * self._size + col
+        if count_move:
+            self._moves += 1
+            self._history.append(index)
+        self._advance(index, 1)
+    
+    def _untoggle_lights(self, row, col):
+        """Отмена нажатия клетки: k - 1 нажатий той же клетки"""
+        self._advance(row * self._size + col, self._states - 1)
+    
+    def _advance(self, index, step):
+        states, board = self._states, self._board
+        lit = self._lit
+        for cell in self._indices[index]:
+            old = board[cell]
+            new = board[cell] = (old + step) % states
+            lit += (new != 0) - (old != 0)
+        self._lit = lit
         
-        return neighbors
\ No newline at end of file
+        # Нажатие уменьшает на step оставшееся число нажатий этой клетки
+        if self._solution is not None:
+            self._solution[index] = (self._solution[index] - step) % states
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Измерение времени горячих путей игры "Выключи свет"
+
+Инструментирование включается явно - вызовом enable() или переменной
+окружения LIGHTSOUT_METRICS=<файл> (см. enable_from_env): только тогда
+методы Game, решателей и окна подменяются обертками, которые считают
+вызовы и собирают гистограммы длительности. Пока оно выключено, классы
+содержат исходные методы, так что на горячем пути нет ни одного
+лишнего вызова. disable() возвращает исходные методы.
+
+Для окна дополнительно измеряется задержка от щелчка по полю до конца
+следующей отрисовки поля (click_to_paint) и, если передано время запуска,
+время до первой отрисовки поля (time_to_first_paint).
+
+Собранные данные выгружаются в JSON (to_json) или в текстовом формате
+Prometheus (to_prometheus).
+"""
+
+import atexit
+import bisect
+import functools
+import importlib
+import json
+import os
+import sys
+import threading
+from time import perf_counter
+
+
+ENV_VAR = "LIGHTSOUT_METRICS"
+PREFIX = "lightsout"
+
+# Верхние границы корзин гистограмм, секунды
+BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+           1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (модуль, класс, методы): учитываются только методы, определенные в самом классе
+ENGINE_TARGETS = (
+    ("game_logic", "Game", ("make_move", "is_solved", "reset_game", "generate_puzzle")),
+    ("game_logic", "ModularGame", ("is_solved", "reset_game", "generate_puzzle")),
+    ("solver", "GF2Solver", ("solve", "solve_optimal", "is_solvable")),
+    ("solver", "LightChasingSolver", ("solve", "solve_optimal", "is_solvable")),
+    ("solver", "ModularSolver", ("solve", "is_solvable")),
+)
+
+# Классы окна подменяются, только если их модули уже импортированы
+QT_TARGETS = (
+    ("main_window", "MainWindow", ("update_display", "_create_grid", "_render_frame", "_auto_solve_step")),
+)
+BOARD_WIDGET = ("board_widget", "BoardWidget")
+
+
+class Histogram:
+    """Гистограмма длительностей с фиксированными корзинами"""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # Последняя корзина - больше BUCKETS[-1]
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, share):
+        """Оценка квантиля сверху: граница корзины, в которую он попадает"""
+        rank = share * self.count
+        total = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), self.counts):
+            total += count
+            if total >= rank and total:
+                return bound
+        return 0.0
+
+
+class Metrics:
+    """Счетчики и гистограммы длительности (потокобезопасно)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def to_json(self):
+        """Снимок метрик в виде словаря для json.dumps"""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {
+                    name: {
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "p50": histogram.quantile(0.5),
+                        "p99": histogram.quantile(0.99),
+                        "buckets": dict(zip([str(bound) for bound in BUCKETS] + ["+Inf"], histogram.counts)),
+                    }
+                    for name, histogram in self.histograms.items()
+                },
+            }
+
+    def to_prometheus(self):
+        """Снимок метрик в текстовом формате Prometheus"""
+        lines = []
+        with self._lock:
+            if self.counters:
+                lines.append(f"# TYPE {PREFIX}_events_total counter")
+                for name, value in sorted(self.counters.items()):
+                    lines.append(f'{PREFIX}_events_total{{event="{name}"}} {value}')
+            if self.histograms:
+                metric = f"{PREFIX}_duration_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                for name, histogram in sorted(self.histograms.items()):
+                    total = 0
+                    for bound, count in zip(BUCKETS, histogram.counts):
+                        total += count
+                        lines.append(f'{metric}_bucket{{name="{name}",le="{bound}"}} {total}')
+                    lines.append(f'{metric}_bucket{{name="{name}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{metric}_sum{{name="{name}"}} {histogram.sum!r}')
+                    lines.append(f'{metric}_count{{name="{name}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+# (класс, атрибут, исходное значение) подмененных методов
+_patched = []
+
+# Время запуска для time_to_first_paint (None - уже измерено или не задано)
+_started = None
+
+
+def _timed(name, function):
+    """Обертка, измеряющая длительность каждого вызова"""
+    observe = METRICS.observe
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            observe(name, perf_counter() - start)
+
+    return wrapper
+
+
+def _patch(cls, attribute, replacement):
+    _patched.append((cls, attribute, cls.__dict__[attribute]))
+    setattr(cls, attribute, replacement)
+
+
+def _patch_targets(targets):
+    for module_name, class_name, attributes in targets:
+        cls = getattr(sys.modules[module_name], class_name)
+        for attribute in attributes:
+            original = cls.__dict__.get(attribute)
+            if original is None:
+                continue
+            name = f"{class_name}.{attribute}"
+            if isinstance(original, property):
+                _patch(cls, attribute, property(_timed(name, original.fget)))
+            else:
+                _patch(cls, attribute, _timed(name, original))
+
+
+def _patch_board_widget(cls):
+    """Задержка от щелчка по полю до конца следующей отрисовки"""
+    release, paint = cls.mouseReleaseEvent, cls.paintEvent
+
+    @functools.wraps(release)
+    def mouseReleaseEvent(self, event):
+        self._metrics_click_time = perf_counter()
+        release(self, event)
+
+    @functools.wraps(paint)
+    def paintEvent(self, event):
+        global _started
+        paint(self, event)
+        METRICS.increment("paint")
+        if _started is not None:
+            METRICS.observe("time_to_first_paint", perf_counter() - _started)
+            _started = None
+        click_time = getattr(self, "_metrics_click_time", None)
+        if click_time is not None:
+            self._metrics_click_time = None
+            METRICS.observe("click_to_paint", perf_counter() - click_time)
+
+    _patch(cls, "mouseReleaseEvent", mouseReleaseEvent)
+    _patch(cls, "paintEvent", paintEvent)
+
+
+def is_enabled():
+    """Включено ли инструментирование"""
+    return bool(_patched)
+
+
+def enable(started=None):
+    """Подмена методов обертками с измерением времени
+
+    Модули игры импортируются здесь; классы окна подменяются, только если
+    их модули уже импортированы, поэтому enable() не тянет за собой PyQt6.
+    started - момент запуска (time.perf_counter()), от которого считается
+    time_to_first_paint.
+    """
+    global _started
+    if _patched:
+        return
+    _started = started
+    for module_name, _, _ in ENGINE_TARGETS:
+        importlib.import_module(module_name)
+    _patch_targets(ENGINE_TARGETS)
+    _patch_targets([target for target in QT_TARGETS if target[0] in sys.modules])
+    if BOARD_WIDGET[0] in sys.modules:
+        _patch_board_widget(getattr(sys.modules[BOARD_WIDGET[0]], BOARD_WIDGET[1]))
+
+
+def disable():
+    """Возврат исходных методов (собранные метрики сохраняются)"""
+    while _patched:
+        cls, attribute, original = _patched.pop()
+        setattr(cls, attribute, original)
+
+
+def write(path):
+    """Выгрузка метрик в файл: .prom и .txt - формат Prometheus, иначе JSON"""
+    with open(path, "w", encoding="utf-8") as file:
+        if path.endswith((".prom", ".txt")):
+            file.write(METRICS.to_prometheus())
+        else:
+            json.dump(METRICS.to_json(), file, indent=2)
+
+
+def enable_from_env(started=None):
+    """Включение по переменной LIGHTSOUT_METRICS с выгрузкой в указанный файл при выходе"""
+    path = os.environ.get(ENV_VAR)
+    if path and not _patched:
+        enable(started)
+        atexit.register(write, path)
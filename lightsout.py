@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Консольный интерфейс "Выключи свет" без графического окна
+
+    python -m lightsout solve [boards.jsonl] [--workers N]
+    python -m lightsout validate replays.bin [...]
+
+Каждая строка входа - JSON-объект с полем "board" (список строк поля,
+каждая - список чисел 0 и 1 или true/false, например [[0, 1], [1, 1]])
+и необязательными полями "id" (копируется в ответ), "topology" (plus,
+torus, moore, moore-torus; по умолчанию plus) и "presses" (список
+нажатий [row, col] игрока, который нужно оценить). Ответы выводятся в
+порядке входных строк, по одной JSON-строке на поле.
+
+Команда validate проверяет файлы с записями партий (см. replay.py) и
+выводит для каждой партии, гасят ли её ходы поле. Для обрезанной или
+испорченной записи и для файла, который не удалось открыть, выводится
+строка с полем "error", и проверка продолжается со следующего файла.
+
+Модуль не импортирует PyQt6 и работает без дисплея.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from collections import deque
+
+from bitboard import TOPOLOGIES, board_from_grid, iter_bits, popcount, toggle_masks
+from replay import iter_validate
+from solver import get_solver, max_board_size
+
+
+# Строк в одной порции работы и порций в обработке на каждый процесс
+CHUNK_SIZE = 256
+CHUNKS_PER_WORKER = 2
+
+
+def solve_record(record):
+    """Решение и оценка одного поля: словарь для ответа"""
+    grid = record["board"]
+    size = len(grid)
+    if any(not isinstance(row, list) for row in grid):
+        raise ValueError("строка поля должна быть списком клеток")
+    if any(len(row) != size for row in grid):
+        raise ValueError("поле должно быть квадратным")
+    for row in grid:
+        for cell in row:
+            # bool - подкласс int; строки "0"/"1" и прочие значения не принимаются
+            if not isinstance(cell, int) or cell not in (0, 1):
+                raise ValueError(f"клетка поля должна быть 0 или 1, а не {cell!r}")
+    board = board_from_grid(grid)
+    topology = TOPOLOGIES[record.get("topology", "plus")]
+    limit = max_board_size(topology)
+    if limit is not None and size > limit:
+        raise ValueError(f"поле с соседством {record['topology']} - не больше {limit} x {limit}")
+
+    after = claimed = None
+    if "presses" in record:
+        masks = toggle_masks(size, topology)
+        after, claimed = board, 0
+        for row, col in record["presses"]:
+            if not (0 <= row < size and 0 <= col < size):
+                raise ValueError(f"нажатие вне поля: {[row, col]}")
+            after ^= masks[row * size + col]
+            claimed ^= 1 << (row * size + col)
+
+    result = {"id": record["id"]} if "id" in record else {}
+    result["size"] = size
+    solver = get_solver(size, topology)
+    presses = solver.solve_optimal(board)
+    result["solvable"] = presses is not None
+    if presses is not None:
+        # Для большого ядра решатель не гарантирует минимум: это лучшее
+        # из найденного им решения и нажатий игрока, а не оптимальная длина
+        if not solver.exact and after == 0 and popcount(claimed) < popcount(presses):
+            presses = claimed
+        result["exact"] = solver.exact
+        result["optimal_moves" if solver.exact else "best_moves"] = popcount(presses)
+        result["presses"] = [list(divmod(index, size)) for index in iter_bits(presses)]
+
+    if "presses" in record:
+        result["valid"] = after == 0
+        result["moves"] = len(record["presses"])
+        if presses is not None and after == 0 and solver.exact:
+            result["excess"] = len(record["presses"]) - result["optimal_moves"]
+    return result
+
+
+def solve_lines(lines):
+    """Обработка порции входных строк: список готовых строк ответа"""
+    output = []
+    for line in lines:
+        try:
+            result = solve_record(json.loads(line))
+        except (ValueError, KeyError, TypeError) as error:
+            result = {"error": f"{type(error).__name__}: {error}"}
+        output.append(json.dumps(result, ensure_ascii=False))
+    return output
+
+
+def _chunks(lines, chunk_size):
+    """Непустые строки входа порциями по chunk_size"""
+    chunk = []
+    for line in lines:
+        if line.strip():
+            chunk.append(line)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def solve_stream(lines, workers=None, chunk_size=CHUNK_SIZE):
+    """Ответы на входные строки в исходном порядке
+
+    Порции раздаются пулу процессов; одновременно в обработке не больше
+    CHUNKS_PER_WORKER порций на процесс, поэтому память не растет с
+    размером входа. Каждый процесс кэширует решатели своих размеров поля.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in _chunks(lines, chunk_size):
+            yield from solve_lines(chunk)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        in_flight = deque()
+        for chunk in _chunks(lines, chunk_size):
+            in_flight.append(pool.apply_async(solve_lines, (chunk,)))
+            if len(in_flight) >= workers * CHUNKS_PER_WORKER:
+                yield from in_flight.popleft().get()
+        while in_flight:
+            yield from in_flight.popleft().get()
+
+
+def validate_path(path):
+    """Вывод результатов проверки одного файла с записями партий"""
+    index = 0  # Номер следующей записи: на ней и остановилась проверка при ошибке
+    try:
+        for valid in iter_validate(path):
+            sys.stdout.write(json.dumps({"file": path, "index": index, "valid": valid}) + "\n")
+            index += 1
+        return
+    except (OSError, ValueError) as error:
+        result = {"file": path, "index": index, "error": f"{type(error).__name__}: {error}"}
+    sys.stdout.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+def main(argv=None):
+    """Точка входа консольного интерфейса"""
+    parser = argparse.ArgumentParser(prog="lightsout", description="Выключи свет без графического окна")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    solve_parser = commands.add_parser("solve", help="решение и оценка полей из JSON-строк")
+    solve_parser.add_argument("input", nargs="?", default="-", help="файл с полями (по умолчанию stdin)")
+    solve_parser.add_argument("--workers", type=int, default=None, help="число процессов")
+    solve_parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="строк в порции")
+
+    validate_parser = commands.add_parser("validate", help="проверка записей партий")
+    validate_parser.add_argument("files", nargs="+", help="файлы с записями партий")
+
+    args = parser.parse_args(argv)
+    if args.command == "validate":
+        for path in args.files:
+            validate_path(path)
+        return
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        for line in solve_stream(source, args.workers, args.chunk_size):
+            sys.stdout.write(line + "\n")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+
+if __name__ == "__main__":
+    main()
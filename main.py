@@ -5,15 +5,21 @@
 Точка входа в приложение
 """
 
+import time
+STARTED = time.perf_counter()  # Отсчет времени до первой отрисовки (до импорта PyQt6)
+
 import sys
 from PyQt6.QtWidgets import QApplication
 
+import instrumentation
 from main_window import MainWindow
 
 
 def main():
     """Основная функция запуска приложения"""
     app = QApplication(sys.argv)
+    # LIGHTSOUT_METRICS=metrics.json - замеры времени с выгрузкой при выходе
+    instrumentation.enable_from_env(STARTED)
     window = MainWindow()
     window.show()
     sys.exit(app.exec())
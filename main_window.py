@@ -3,13 +3,22 @@
 Главное окно игры "Выключи свет"
 """
 
+from time import perf_counter
+
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                            QGridLayout, QPushButton, QLabel, QMessageBox, QDialog)
-from PyQt6.QtGui import QFont
+                            QPushButton, QLabel, QMessageBox, QDialog)
+from PyQt6.QtCore import QTimer
+from PyQt6.QtGui import QFont, QKeySequence
 
-from game_logic import Game
-from ui_components import SettingsDialog, RulesDialog, LightButton, DifficultySelectionDialog
-from config import DEFAULT_LIGHT_COLOR, DEFAULT_DARK_COLOR, WINDOW_WIDTH, WINDOW_HEIGHT, DIFFICULTY_LEVELS
+from bitboard import TOPOLOGIES
+from board_widget import BoardWidget
+from catalogue import get_catalogue
+from game_logic import create_game
+from solver import max_board_size
+from ui_components import DifficultySelectionDialog, RulesDialog, SettingsDialog
+from config import (DEFAULT_LIGHT_COLOR, DEFAULT_DARK_COLOR, WINDOW_WIDTH, WINDOW_HEIGHT, DIFFICULTY_LEVELS,
+                    BOARD_SIZES, TOPOLOGY_NAMES, STATE_COUNTS, FRAME_INTERVAL_MS, AUTO_SOLVE_RATE,
+                    AUTO_SOLVE_MAX_SECONDS)
 
 
 class MainWindow(QMainWindow):
@@ -17,10 +26,26 @@ class MainWindow(QMainWindow):
     
     def __init__(self):
         super().__init__()
-        self.game = Game()  # По умолчанию средний уровень
+        self.game = create_game()  # По умолчанию средний уровень
+        self.puzzles = None  # Очереди головоломок запускаются после первого кадра
         self.light_color = DEFAULT_LIGHT_COLOR
         self.dark_color = DEFAULT_DARK_COLOR
-        self.buttons = []
+        self.hint_cell = None
+        
+        # Ходы сразу применяются к игре, а поле обновляется не чаще раза за кадр
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.timeout.connect(self._render_frame)
+        self._last_frame = 0.0
+        self._player_moved = False  # Победу поздравляем, только если последний ход сделал игрок
+        
+        # Показ решения: оставшиеся нажатия проигрываются по таймеру
+        self._auto_timer = QTimer(self)
+        self._auto_timer.timeout.connect(self._auto_solve_step)
+        self._auto_presses = None
+        self._auto_done = 0
+        self._auto_rate = AUTO_SOLVE_RATE
+        self._auto_started = 0.0
         
         self.setWindowTitle("Выключи свет")
         self.setFixedSize(WINDOW_WIDTH, WINDOW_HEIGHT)
@@ -29,6 +54,21 @@ class MainWindow(QMainWindow):
         self._setup_menu()
         self.new_game()
     
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.puzzles is None:
+            QTimer.singleShot(0, self._start_puzzles)
+    
+    def _start_puzzles(self):
+        """Запуск фоновой подготовки головоломок, когда окно уже показано"""
+        if self.puzzles is not None or not self.isVisible():
+            return  # Уже запущены или окно успели закрыть
+        # Исключение из импортов в начале файла: пул потоков не нужен для первого кадра,
+        # а импорт concurrent.futures - около 17 мс из ~120 мс до первой отрисовки
+        from puzzle_provider import PuzzleProvider
+        self.puzzles = PuzzleProvider(self.game.size, topology=self.game.topology, unique=True)
+        self.puzzles.prefetch()
+    
     def _setup_ui(self):
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -48,9 +88,8 @@ class MainWindow(QMainWindow):
         
         self.main_layout.addLayout(info_layout)
         
-        # Игровое поле
-        self.grid_widget = QWidget()
-        self.main_layout.addWidget(self.grid_widget)
+        # Игровое поле создается при первой привязке к игре
+        self.grid_widget = None
         
         # Кнопка новой игры
         new_game_btn = QPushButton("Новая игра")
@@ -68,6 +107,25 @@ class MainWindow(QMainWindow):
         new_action = game_menu.addAction("Новая игра")
         new_action.triggered.connect(self.new_game)
         
+        daily_action = game_menu.addAction("Головоломка дня")
+        daily_action.triggered.connect(self.daily_game)
+        
+        undo_action = game_menu.addAction("Отменить ход")
+        undo_action.setShortcut(QKeySequence.StandardKey.Undo)
+        undo_action.triggered.connect(self.undo_move)
+        
+        redo_action = game_menu.addAction("Повторить ход")
+        redo_action.setShortcut(QKeySequence.StandardKey.Redo)
+        redo_action.triggered.connect(self.redo_move)
+        
+        hint_action = game_menu.addAction("Подсказка")
+        hint_action.setShortcut("H")
+        hint_action.triggered.connect(self.show_hint)
+        
+        solve_action = game_menu.addAction("Показать решение")
+        solve_action.setShortcut("S")
+        solve_action.triggered.connect(self.toggle_auto_solve)
+        
         settings_action = game_menu.addAction("Настройки")
         settings_action.triggered.connect(self.show_settings)
         
@@ -77,6 +135,24 @@ class MainWindow(QMainWindow):
             action = difficulty_menu.addAction(difficulty)
             action.triggered.connect(lambda checked, d=difficulty: self.set_difficulty(d))
         
+        # Меню размера поля
+        size_menu = game_menu.addMenu("Размер поля")
+        for size in BOARD_SIZES:
+            action = size_menu.addAction(f"{size} x {size}")
+            action.triggered.connect(lambda checked, n=size: self.set_board_size(n))
+        
+        # Меню соседства клеток
+        topology_menu = game_menu.addMenu("Соседство")
+        for key in TOPOLOGIES:
+            action = topology_menu.addAction(TOPOLOGY_NAMES[key])
+            action.triggered.connect(lambda checked, k=key: self.set_topology(TOPOLOGIES[k]))
+        
+        # Меню числа состояний клетки
+        states_menu = game_menu.addMenu("Число состояний")
+        for states in STATE_COUNTS:
+            action = states_menu.addAction(str(states))
+            action.triggered.connect(lambda checked, k=states: self.set_states(k))
+        
         game_menu.addSeparator()
         
         exit_action = game_menu.addAction("Выход")
@@ -89,56 +165,170 @@ class MainWindow(QMainWindow):
         rules_action.triggered.connect(self.show_rules)
     
     def _create_grid(self):
-        """Создание сетки кнопок"""
+        """Создание игрового поля"""
         # Удаляем старый grid_widget если он есть
-        if hasattr(self, 'grid_widget') and self.grid_widget is not None:
+        if self.grid_widget is not None:
             self.main_layout.removeWidget(self.grid_widget)
             self.grid_widget.setParent(None)
             self.grid_widget.deleteLater()
         
-        # Создаем новый grid_widget
-        self.grid_widget = QWidget()
+        # Все клетки рисует один виджет, щелчок переводится в (row, col)
+        self.grid_widget = BoardWidget(self.game.size)
+        self.grid_widget.clicked_with_position.connect(self.on_button_clicked)
+        self.grid_widget.set_grid(self.game.grid, self.game.states)
         
         # Вставляем его в правильное место в layout (позиция 1 - после info_layout)
         self.main_layout.insertWidget(1, self.grid_widget)
+    
+    def _bind_grid(self):
+        """Привязка игрового поля к текущей игре
+        
+        Виджет поля переиспользуется между играми и пересоздается только
+        при изменении размера поля.
+        """
+        self.stop_auto_solve()
+        self.hint_cell = None
+        if self.grid_widget is None or self.grid_widget.board_size != self.game.size:
+            self._create_grid()
+        else:
+            self.grid_widget.set_hint(None)
+            self.grid_widget.set_grid(self.game.grid, self.game.states)
+    
+    def update_display(self, full=False):
+        """Обновление отображения игрового поля
         
-        # Создание новой сетки
-        self.grid_layout = QGridLayout()
-        self.grid_widget.setLayout(self.grid_layout)
-        
-        self.buttons = []
-        for row in range(self.game.size):
-            button_row = []
-            for col in range(self.game.size):
-                button = LightButton(row, col)
-                button.clicked_with_position.connect(self.on_button_clicked)
-                self.grid_layout.addWidget(button, row, col)
-                button_row.append(button)
-            self.buttons.append(button_row)
-    
-    def update_display(self):
-        """Обновление отображения игрового поля"""
-        for row in range(self.game.size):
-            for col in range(self.game.size):
-                is_on = self.game.grid[row][col]
-                self.buttons[row][col].set_state(is_on, self.light_color, self.dark_color)
+        Перерисовываются только клетки, изменившиеся с прошлого обновления;
+        full=True перерисовывает все поле (новая игра, смена цветов).
+        """
+        changed_cells = self.game.pop_changed_cells()
+        if full:
+            self.grid_widget.set_colors(self.light_color, self.dark_color)
+        else:
+            self.grid_widget.update_cells(changed_cells)
         
         self.moves_label.setText(f"Ходы: {self.game.moves}")
         self.difficulty_label.setText(f"Уровень: {self.game.difficulty}")
     
+    def _schedule_frame(self):
+        """Обновление поля и проверка победы в ближайшем кадре
+        
+        Все ходы, сделанные до начала кадра, отображаются одним обновлением.
+        """
+        if not self._frame_timer.isActive():
+            elapsed = (perf_counter() - self._last_frame) * 1000
+            self._frame_timer.start(max(0, int(FRAME_INTERVAL_MS - elapsed)))
+    
+    def _render_frame(self):
+        """Кадр: обновление поля и проверка победы"""
+        self._last_frame = perf_counter()
+        self.update_display()
+        player_moved, self._player_moved = self._player_moved, False
+        if player_moved and self.game.is_solved:
+            self.show_victory_dialog()
+    
+    def show_hint(self):
+        """Выделение клетки, которую стоит нажать следующей"""
+        self.hint_cell = self.game.hint()
+        self.grid_widget.set_hint(self.hint_cell)
+    
+    def _clear_hint(self):
+        """Снятие выделения подсказки"""
+        if self.hint_cell is not None:
+            self.hint_cell = None
+            self.grid_widget.set_hint(None)
+    
+    def undo_move(self):
+        """Отмена последнего хода"""
+        self.stop_auto_solve()
+        if self.game.undo() is not None:
+            self._clear_hint()
+            self._schedule_frame()
+    
+    def redo_move(self):
+        """Повтор отмененного хода"""
+        self.stop_auto_solve()
+        if self.game.redo() is not None:
+            self._clear_hint()
+            self._player_moved = True
+            self._schedule_frame()
+    
     def on_button_clicked(self, row, col):
-        """Обработка нажатия на кнопку"""
+        """Обработка нажатия на кнопку
+        
+        Ход сразу применяется к игре, а поле и проверка победы обновляются
+        в ближайшем кадре (_render_frame).
+        """
+        self.stop_auto_solve()
+        self._clear_hint()
         self.game.make_move(row, col)
-        self.update_display()
+        self._player_moved = True
+        self._schedule_frame()
+    
+    def toggle_auto_solve(self):
+        """Запуск или остановка показа решения"""
+        if self._auto_presses is not None:
+            self.stop_auto_solve()
+        else:
+            self.start_auto_solve()
+    
+    def start_auto_solve(self):
+        """Показ решения: нажатия решателя с частотой AUTO_SOLVE_RATE в секунду
         
-        if self.game.is_solved:
-            self.show_victory_dialog()
+        Решения длиннее AUTO_SOLVE_RATE * AUTO_SOLVE_MAX_SECONDS нажатий
+        проигрываются быстрее, но поле все равно обновляется раз за кадр.
+        """
+        presses = self.game.press_sequence(optimal=True)
+        if presses is None:
+            QMessageBox.information(self, "Выключи свет", "У этой головоломки нет решения")
+            return
+        if not presses:
+            return
+        self._clear_hint()
+        self._auto_presses = presses
+        self._auto_done = 0
+        self._auto_rate = max(AUTO_SOLVE_RATE, len(presses) / AUTO_SOLVE_MAX_SECONDS)
+        self._auto_started = perf_counter()
+        self._auto_timer.start(max(FRAME_INTERVAL_MS, int(1000 / self._auto_rate)))
+        self._auto_solve_step()
+    
+    def stop_auto_solve(self):
+        """Остановка показа решения (сделанные нажатия остаются в журнале ходов)"""
+        self._auto_timer.stop()
+        self._auto_presses = None
+    
+    def _auto_solve_step(self):
+        """Нажатия, время которых уже наступило, с одним обновлением поля"""
+        presses = self._auto_presses
+        due = min(len(presses), int((perf_counter() - self._auto_started) * self._auto_rate) + 1)
+        make_move = self.game.make_move
+        for row, col in presses[self._auto_done:due]:
+            make_move(row, col)
+        self._auto_done = due
+        if due == len(presses):
+            self.stop_auto_solve()
+        self._schedule_frame()
+    
+    def _reset_game(self, difficulty=None):
+        """Новая головоломка из очереди (или синхронно, если очередь пуста)"""
+        if self.puzzles is None or self.game.states != 2:
+            # Очереди еще не запущены или готовят только поля с двумя состояниями
+            catalogue = get_catalogue(self.game.size, self.game.topology) if self.game.states == 2 else None
+            self.game.reset_game(difficulty, catalogue=catalogue)
+            return
+        board, solution = self.puzzles.take(difficulty or self.game.difficulty)
+        self.game.reset_game(difficulty, board, solution)
     
     def new_game(self):
         """Начало новой игры"""
-        self.game.reset_game()
-        self._create_grid()
-        self.update_display()
+        self._reset_game()
+        self._bind_grid()
+        self.update_display(full=True)
+    
+    def daily_game(self):
+        """Начало игры с головоломкой дня"""
+        self.game.reset_daily()
+        self._bind_grid()
+        self.update_display(full=True)
     
     def show_settings(self):
         """Показ диалога настроек"""
@@ -148,8 +338,8 @@ class MainWindow(QMainWindow):
             self.light_color = settings['light_color']
             self.dark_color = settings['dark_color']
             
-            # Цвета изменились, обновляем отображение
-            self.update_display()
+            # Цвета изменились, перерисовываем все поле
+            self.update_display(full=True)
     
     def show_rules(self):
         """Показ диалога с правилами"""
@@ -158,9 +348,45 @@ class MainWindow(QMainWindow):
     
     def set_difficulty(self, difficulty):
         """Установка уровня сложности"""
-        self.game.reset_game(difficulty)
-        self._create_grid()
-        self.update_display()
+        self._reset_game(difficulty)
+        self._bind_grid()
+        self.update_display(full=True)
+    
+    def set_board_size(self, size):
+        """Установка размера игрового поля"""
+        self._change_board(size, self.game.topology, self.game.states)
+    
+    def set_topology(self, topology):
+        """Установка соседства клеток"""
+        self._change_board(self.game.size, topology, self.game.states)
+    
+    def set_states(self, states):
+        """Установка числа состояний клетки"""
+        self._change_board(self.game.size, self.game.topology, states)
+    
+    def _change_board(self, size, topology, states):
+        """Новая игра на другом поле: размер, соседство или число состояний"""
+        limit = max_board_size(topology, states)
+        if limit is not None and size > limit:
+            # Решатель такого поля строился бы минутами в потоке интерфейса
+            QMessageBox.warning(self, "Выключи свет",
+                                f"С таким соседством и числом состояний поле может быть "
+                                f"не больше {limit} x {limit}")
+            return
+        self.game = create_game(self.game.difficulty, size, topology, states)
+        if self.puzzles is not None:
+            self.puzzles.set_board(size, topology)
+        self._reset_game()
+        self._bind_grid()
+        self.update_display(full=True)
+    
+    def closeEvent(self, event):
+        self.stop_auto_solve()
+        self._frame_timer.stop()
+        if self.puzzles is not None:
+            self.puzzles.shutdown()
+            self.puzzles = None
+        super().closeEvent(event)
     
     def show_victory_dialog(self):
         """Показ диалога победы с предложением новой игры"""
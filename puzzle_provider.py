@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Фоновая подготовка головоломок для игры "Выключи свет"
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from config import DIFFICULTY_LEVELS, GRID_SIZE, PUZZLE_QUEUE_SIZE, PUZZLE_WORKERS
+from bitboard import DEFAULT_TOPOLOGY
+from catalogue import get_catalogue
+from game_logic import generate_board
+
+
+def generate_puzzle(size, difficulty, topology=DEFAULT_TOPOLOGY, unique=False):
+    """Готовая головоломка: поле и его оптимальное решение
+    
+    С unique=True поле берется из тех, которых еще не было в каталоге
+    (catalogue.get_catalogue), и записывается в него.
+    """
+    min_moves, max_moves = DIFFICULTY_LEVELS[difficulty]
+    catalogue = get_catalogue(size, topology) if unique else None
+    return generate_board(size, min_moves, max_moves, topology=topology, catalogue=catalogue)
+
+
+class PuzzleProvider:
+    """Очереди готовых головоломок для каждого уровня сложности
+    
+    Очереди пополняются в пуле потоков, поэтому новая игра начинается
+    без генерации в потоке интерфейса. Если очередь пуста, головоломка
+    генерируется синхронно. С unique=True головоломки не повторяются
+    (см. catalogue), а подготовленные, но не выданные головоломки при
+    смене поля и остановке удаляются из каталога.
+    """
+    
+    def __init__(self, size=GRID_SIZE, queue_size=PUZZLE_QUEUE_SIZE, workers=PUZZLE_WORKERS,
+                 topology=DEFAULT_TOPOLOGY, unique=False):
+        self._board_key = (size, topology)  # Для какого поля готовятся головоломки
+        self._unique = unique
+        self._queue_size = queue_size
+        self._queues = {difficulty: deque() for difficulty in DIFFICULTY_LEVELS}
+        self._pending = dict.fromkeys(DIFFICULTY_LEVELS, 0)
+        self._lock = threading.RLock()  # Колбэк готового future вызывается сразу
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="puzzle")
+        self._closed = False
+    
+    @property
+    def size(self):
+        """Размер поля, для которого готовятся головоломки"""
+        return self._board_key[0]
+    
+    @property
+    def topology(self):
+        """Топология поля, для которого готовятся головоломки"""
+        return self._board_key[1]
+    
+    def set_board(self, size, topology=DEFAULT_TOPOLOGY):
+        """Смена поля: готовые головоломки для прежнего поля отбрасываются"""
+        with self._lock:
+            if (size, topology) == self._board_key:
+                return
+            dropped = self._drain()
+            old_key, self._board_key = self._board_key, (size, topology)
+        self._release(old_key, dropped)
+        self.prefetch()
+    
+    def prefetch(self, difficulty=None):
+        """Пополнение очереди уровня (по умолчанию всех уровней)"""
+        difficulties = [difficulty] if difficulty else list(self._queues)
+        with self._lock:
+            if self._closed:
+                return
+            for level in difficulties:
+                missing = self._queue_size - len(self._queues[level]) - self._pending[level]
+                for _ in range(missing):
+                    self._pending[level] += 1
+                    future = self._executor.submit(generate_puzzle, self.size, level, self.topology,
+                                                   self._unique)
+                    future.add_done_callback(
+                        lambda done, level=level, key=self._board_key: self._on_generated(done, level, key))
+    
+    def _on_generated(self, future, difficulty, board_key):
+        with self._lock:
+            self._pending[difficulty] -= 1
+            if future.cancelled() or future.exception() is not None:
+                return
+            if self._closed or board_key != self._board_key:
+                stale = [future.result()]
+            else:
+                self._queues[difficulty].append(future.result())
+                return
+        self._release(board_key, stale)
+    
+    def _drain(self):
+        """Извлечение всех готовых головоломок из очередей (под блокировкой)"""
+        puzzles = [puzzle for queue in self._queues.values() for puzzle in queue]
+        for queue in self._queues.values():
+            queue.clear()
+        return puzzles
+    
+    def _release(self, board_key, puzzles):
+        """Удаление из каталога головоломок, которые так и не были выданы"""
+        if not self._unique or not puzzles:
+            return
+        catalogue = get_catalogue(*board_key)
+        if catalogue is not None:
+            for board, _ in puzzles:
+                catalogue.discard(board)
+    
+    def take(self, difficulty):
+        """Головоломка (board, solution) уровня difficulty без ожидания генерации"""
+        with self._lock:
+            queue = self._queues[difficulty]
+            puzzle = queue.popleft() if queue else None
+            size, topology = self._board_key
+        self.prefetch(difficulty)
+        if puzzle is None:
+            puzzle = generate_puzzle(size, difficulty, topology, self._unique)
+        return puzzle
+    
+    def shutdown(self):
+        """Остановка пула потоков; невыданные головоломки удаляются из каталога"""
+        with self._lock:
+            self._closed = True
+            dropped = self._drain()
+            board_key = self._board_key
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._release(board_key, dropped)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Двоичная запись партий "Выключи свет" для сохранения и повтора
+
+Запись партии (little-endian):
+    заголовок       - магическая строка, версия, флаги, размер поля,
+                      число смещений соседства, число ходов
+    соседство       - пары (dr, dc) по одному знаковому байту
+                      (поле замкнуто в тор при флаге FLAG_WRAP)
+    начальное поле  - битовая маска в ceil(size^2 / 8) байтах
+    журнал ходов    - номера клеток row * size + col, uint16
+                      (uint32 при флаге FLAG_WIDE_LOG)
+
+Записи можно складывать в один файл друг за другом: iter_replays читает
+их из mmap без копирования, что позволяет проверять тысячи партий.
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from bitboard import Topology, toggle_masks
+from game_logic import Game
+
+
+MAGIC = b"LOSV"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHBxI")
+FLAG_WIDE_LOG = 1
+FLAG_WRAP = 2
+
+
+def board_length(size):
+    """Число байт для битовой маски поля"""
+    return (size * size + 7) // 8
+
+
+def dumps(game):
+    """Запись партии в байты (только для игры с двумя состояниями клетки)"""
+    if game.states != 2:
+        raise ValueError("Формат записи поддерживает только игру с двумя состояниями клетки")
+    history = game.history
+    if sys.byteorder != "little":
+        history.byteswap()
+    topology = game.topology
+    flags = FLAG_WIDE_LOG if history.itemsize == 4 else 0
+    if topology.wrap:
+        flags |= FLAG_WRAP
+    data = bytearray(HEADER.pack(MAGIC, VERSION, flags, game.size, len(topology.offsets), len(history)))
+    for dr, dc in topology.offsets:
+        data += struct.pack("<bb", dr, dc)
+    data += game.initial_board.to_bytes(board_length(game.size), "little")
+    data += history.tobytes()
+    return bytes(data)
+
+
+def save_game(game, path, append=False):
+    """Сохранение партии в файл (append=True - дописать в конец)"""
+    with open(path, "ab" if append else "wb") as file:
+        file.write(dumps(game))
+
+
+class Replay:
+    """Прочитанная запись партии (журнал ходов не копируется)"""
+
+    def __init__(self, size, topology, initial_board, log):
+        self.size = size
+        self.topology = topology
+        self.initial_board = initial_board
+        self.log = log
+
+    def final_board(self):
+        """Поле после всех ходов или None, если в журнале есть клетка вне поля"""
+        cells = self.size * self.size
+        masks = toggle_masks(self.size, self.topology)
+        board = self.initial_board
+        for index in self.log:
+            if index >= cells:
+                return None
+            board ^= masks[index]
+        return board
+
+    def is_valid(self):
+        """Проверка, что ходы из журнала гасят поле"""
+        return self.final_board() == 0
+
+    def release(self):
+        """Освобождение журнала ходов, если он - представление буфера (перед закрытием mmap)"""
+        if isinstance(self.log, memoryview):
+            self.log.release()
+
+    def to_game(self):
+        """Игра, воспроизведенная до последнего хода (с журналом для отмены)"""
+        game = Game(size=self.size, topology=self.topology)
+        game.reset_game(board=self.initial_board)
+        for index in self.log:
+            game.make_move(*divmod(index, self.size))
+        return game
+
+
+def parse_replay(buffer, offset=0):
+    """Запись партии из буфера: (Replay, смещение следующей записи)
+
+    Для обрезанной или испорченной записи возбуждается ValueError.
+    """
+    if offset + HEADER.size > len(buffer):
+        raise ValueError(f"Запись партии по смещению {offset} обрезана")
+    magic, version, flags, size, kernel_length, log_length = HEADER.unpack_from(buffer, offset)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Нет записи партии по смещению {offset}")
+    position = offset + HEADER.size
+    length = board_length(size)
+    typecode = "I" if flags & FLAG_WIDE_LOG else "H"
+    end = position + 2 * kernel_length + length + log_length * array(typecode).itemsize
+    if end > len(buffer):
+        raise ValueError(f"Запись партии по смещению {offset} обрезана")
+
+    pairs = struct.unpack_from(f"<{2 * kernel_length}b", buffer, position)
+    topology = Topology(tuple(zip(pairs[::2], pairs[1::2])), bool(flags & FLAG_WRAP))
+    position += 2 * kernel_length
+
+    initial_board = int.from_bytes(buffer[position:position + length], "little")
+    position += length
+    if sys.byteorder == "little":
+        log = memoryview(buffer)[position:end].cast(typecode)
+    else:
+        log = array(typecode, buffer[position:end])
+        log.byteswap()
+    return Replay(size, topology, initial_board, log), end
+
+
+def iter_replays(buffer):
+    """Все записи партий, сложенные в буфере друг за другом"""
+    offset = 0
+    while offset < len(buffer):
+        replay, offset = parse_replay(buffer, offset)
+        yield replay
+
+
+def load_game(path):
+    """Игра из файла с одной записью партии"""
+    with open(path, "rb") as file:
+        replay, _ = parse_replay(file.read())
+    return replay.to_game()
+
+
+def iter_validate(path):
+    """Признаки, что партии файла решены, по одной партии
+
+    Признаки уже проверенных партий выдаются до того, как на обрезанной
+    или испорченной записи возбуждается ValueError: дальше записи файла
+    не разобрать, потому что неизвестно, где начинается следующая.
+    """
+    with open(path, "rb") as file:
+        if not os.fstat(file.fileno()).st_size:
+            return  # Пустой файл нельзя отобразить в память
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        for replay in iter_replays(buffer):
+            valid = replay.is_valid()
+            # Журнал - представление mmap: пока оно живо, mmap не закрыть
+            replay.release()
+            yield valid
+    finally:
+        buffer.close()
+
+
+def validate_file(path):
+    """Проверка всех партий файла: список признаков, что партия решена"""
+    return list(iter_validate(path))
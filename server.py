@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Локальный игровой сервер "Выключи свет" для множества игроков
+
+Протокол - JSON-строки поверх TCP, один запрос и один ответ на строку:
+    {"op": "new", "difficulty": "Средний", "size": 5,
+     "topology": "plus", "daily": false}                 -> {"session": 1, ...}
+    {"op": "move", "session": 1, "row": 0, "col": 2}    -> {"moves": 1, "solved": false}
+    {"op": "hint", "session": 1}                        -> {"hint": [2, 3]}
+    {"op": "state", "session": 1}                       -> {"board": ["01100", ...], ...}
+
+Сессии хранятся как объекты Game со __slots__ и битовым полем. Сверх
+MAX_SESSIONS давно не использовавшиеся сессии вытесняются в файл dbm и
+загружаются обратно при следующем обращении.
+"""
+
+import argparse
+import asyncio
+import dbm
+import itertools
+import json
+import struct
+from collections import OrderedDict
+
+from config import (DIFFICULTY_LEVELS, GRID_SIZE, MAX_SESSIONS, SERVER_HOST, SERVER_PORT,
+                    SESSION_STORE_PATH)
+import instrumentation
+from bitboard import TOPOLOGIES
+from game_logic import Game
+from solver import max_board_size
+
+
+# Заголовок вытесненной сессии: уровень, размер, ходы, есть ли решение, топология
+SESSION_HEADER = struct.Struct("<BHIBB")
+DIFFICULTIES = list(DIFFICULTY_LEVELS)
+TOPOLOGY_LIST = list(TOPOLOGIES.values())
+# Служебные записи и сессии не пересекаются: ключи сессий - b"session:<id>"
+NEXT_ID_KEY = b"next_id"
+SESSION_KEY_PREFIX = b"session:"
+
+
+def is_integer(value):
+    """Целое число JSON (bool в Python - тоже int, но не принимается)"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def session_key(session_id):
+    """Ключ вытесненной сессии в файле dbm"""
+    return SESSION_KEY_PREFIX + str(session_id).encode()
+
+
+def pack_game(game):
+    """Компактная запись состояния игры"""
+    difficulty, size, board, moves, solution, topology = game.state
+    length = (size * size + 7) // 8
+    data = SESSION_HEADER.pack(DIFFICULTIES.index(difficulty), size, moves, solution is not None,
+                               TOPOLOGY_LIST.index(topology))
+    data += board.to_bytes(length, "little")
+    if solution is not None:
+        data += solution.to_bytes(length, "little")
+    return data
+
+
+def unpack_game(data):
+    """Игра из записи pack_game (ValueError, если запись повреждена)"""
+    try:
+        difficulty, size, moves, has_solution, topology_id = SESSION_HEADER.unpack_from(data)
+    except struct.error:
+        raise ValueError("запись сессии повреждена: обрезан заголовок") from None
+    length = (size * size + 7) // 8
+    start = SESSION_HEADER.size
+    if (not size or difficulty >= len(DIFFICULTIES) or topology_id >= len(TOPOLOGY_LIST)
+            or len(data) != start + length * (2 if has_solution else 1)):
+        raise ValueError("запись сессии повреждена")
+    board = int.from_bytes(data[start:start + length], "little")
+    solution = int.from_bytes(data[start + length:start + 2 * length], "little") if has_solution else None
+    topology = TOPOLOGY_LIST[topology_id]
+    return Game.from_state((DIFFICULTIES[difficulty], size, board, moves, solution, topology))
+
+
+class SessionStore:
+    """Сессии в памяти с вытеснением давно не использовавшихся (LRU) на диск"""
+
+    def __init__(self, path=SESSION_STORE_PATH, capacity=MAX_SESSIONS):
+        self._capacity = capacity
+        self._sessions = OrderedDict()
+        self._disk = dbm.open(path, "c")
+        # Номера сессий продолжаются после перезапуска, не затирая вытесненные
+        self._ids = itertools.count(int(self._disk.get(NEXT_ID_KEY, b"1")))
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self, difficulty, size, topology='plus', daily=False):
+        """Новая сессия с новой головоломкой (daily=True - головоломкой дня): (id, game)"""
+        game = Game(difficulty, size, TOPOLOGIES[topology])
+        if daily:
+            game.reset_daily()
+        else:
+            game.reset_game()
+        session_id = next(self._ids)
+        self._put(session_id, game)
+        return session_id, game
+
+    def get(self, session_id):
+        """Игра сессии или None, если такой сессии нет
+
+        Номер сессии - только целое число: строка "1" не должна находить
+        на диске устаревшую копию сессии 1, живущей в памяти.
+        """
+        if not is_integer(session_id):
+            return None
+        game = self._sessions.get(session_id)
+        if game is not None:
+            self._sessions.move_to_end(session_id)
+            return game
+        # Запись на диске не удаляется: при следующем вытеснении она перезаписывается
+        data = self._disk.get(session_key(session_id))
+        if data is None:
+            return None
+        game = unpack_game(data)
+        self._put(session_id, game)
+        return game
+
+    def _put(self, session_id, game):
+        self._sessions[session_id] = game
+        if len(self._sessions) > self._capacity:
+            old_id, old_game = self._sessions.popitem(last=False)
+            self._disk[session_key(old_id)] = pack_game(old_game)
+            self.evictions += 1
+
+    def close(self):
+        """Сохранение всех сессий на диск и закрытие хранилища"""
+        while self._sessions:
+            session_id, game = self._sessions.popitem(last=False)
+            self._disk[session_key(session_id)] = pack_game(game)
+        self._disk[NEXT_ID_KEY] = str(next(self._ids)).encode()
+        self._disk.close()
+
+
+class GameServer:
+    """Обработка запросов к сессиям"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def handle(self, request):
+        """Ответ (словарь) на один запрос"""
+        if not isinstance(request, dict):
+            return {"error": "запрос должен быть JSON-объектом"}
+        op = request.get("op")
+        if op == "new":
+            difficulty = request.get("difficulty", "Средний")
+            size = request.get("size", GRID_SIZE)
+            topology = request.get("topology", "plus")
+            if (difficulty not in DIFFICULTY_LEVELS or topology not in TOPOLOGIES
+                    or not is_integer(size) or not 1 <= size <= 255):
+                return {"error": "некорректные параметры игры"}
+            limit = max_board_size(TOPOLOGIES[topology])
+            if limit is not None and size > limit:
+                # Решатель большого поля строился бы минутами и остановил бы цикл событий
+                return {"error": f"поле с соседством {topology} - не больше {limit} x {limit}"}
+            session_id, game = self.store.create(difficulty, size, topology, bool(request.get("daily")))
+            return {"session": session_id, "size": game.size, "difficulty": game.difficulty,
+                    "topology": topology}
+
+        session_id = request.get("session")
+        if not is_integer(session_id):
+            return {"error": "session должен быть целым числом"}
+        try:
+            game = self.store.get(session_id)
+        except ValueError as error:
+            return {"error": str(error)}
+        if game is None:
+            return {"error": "сессия не найдена"}
+        if op == "move":
+            row, col = request.get("row"), request.get("col")
+            # Только целые координаты: иначе ход засчитывается до ошибки в журнале ходов
+            if not (is_integer(row) and is_integer(col)):
+                return {"error": "row и col должны быть целыми числами"}
+            if not game.make_move(row, col):
+                return {"error": "ход вне поля"}
+            return {"moves": game.moves, "solved": game.is_solved}
+        if op == "hint":
+            hint = game.hint()
+            return {"hint": list(hint) if hint is not None else None}
+        if op == "state":
+            return {
+                "size": game.size,
+                "difficulty": game.difficulty,
+                "moves": game.moves,
+                "solved": game.is_solved,
+                "board": ["".join("1" if cell else "0" for cell in row) for row in game.grid],
+            }
+        return {"error": f"неизвестная операция: {op}"}
+
+    async def serve_client(self, reader, writer):
+        """Обслуживание одного соединения"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = self.handle(json.loads(line))
+                except (ValueError, TypeError) as error:
+                    response = {"error": str(error)}
+                writer.write(json.dumps(response, ensure_ascii=False).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+async def serve(host=SERVER_HOST, port=SERVER_PORT, store_path=SESSION_STORE_PATH,
+                capacity=MAX_SESSIONS):
+    """Запуск сервера до остановки"""
+    store = SessionStore(store_path, capacity)
+    server = await asyncio.start_server(GameServer(store).serve_client, host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        store.close()
+
+
+def main(argv=None):
+    """Запуск сервера из командной строки"""
+    parser = argparse.ArgumentParser(description="Игровой сервер 'Выключи свет'")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--store", default=SESSION_STORE_PATH, help="файл вытесненных сессий")
+    parser.add_argument("--max-sessions", type=int, default=MAX_SESSIONS,
+                        help="число сессий в памяти")
+    args = parser.parse_args(argv)
+    instrumentation.enable_from_env()
+    try:
+        asyncio.run(serve(args.host, args.port, args.store, args.max_sessions))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+"""
+Решатель "Выключи свет" методом линейной алгебры над Z/2Z
+
+Нажатие j переключает клетки из маски masks[j], поэтому поле b решается
+набором нажатий x тогда и только тогда, когда A·x = b (mod 2), где
+столбец j матрицы A - это masks[j]. Матрица приводится методом Гаусса
+один раз для каждой пары (размер, топология), после чего решение любого
+поля - это одно умножение псевдообратной матрицы на вектор.
+
+Для игры с k состояниями клетки та же система решается над Z/kZ
+(ModularSolver): по отдельности для каждой степени простого из разложения
+k с последующей склейкой по китайской теореме об остатках.
+"""
+
+import random
+from functools import lru_cache
+
+from bitboard import DEFAULT_TOPOLOGY, iter_bits, join_rows, popcount, split_rows, toggle_masks
+
+
+# Поля большего размера решаются "погоней за светом" без матрицы n^2 x n^2
+MAX_DENSE_SIZE = 16
+
+# Наибольший размер поля с нестандартным соседством: "погоня за светом" к нему
+# не применяется, и матрица n^2 x n^2 приводится целиком (50 x 50 - секунды)
+MAX_TOPOLOGY_SIZE = 20
+
+# Ядро размерности до этого значения перебирается полностью (2^k решений)
+MAX_ENUMERATED_NULLITY = 20
+
+# Для ядра большей размерности: число случайных приведений базиса (меньше,
+# если приведение дороже MAX_SEARCH_WORK операций над 64-битными словами,
+# но не меньше MIN_SEARCH_RESTARTS) и ограничение проходов локального поиска
+MIN_SEARCH_RESTARTS = 4
+MAX_SEARCH_RESTARTS = 128
+MAX_SEARCH_WORK = 1 << 24
+MAX_SEARCH_ROUNDS = 64
+
+
+def minimum_weight(presses, null_space):
+    """Решение с наименьшим числом нажатий среди presses + span(null_space)
+
+    Небольшое ядро перебирается полностью в порядке кода Грея, так что
+    соседние кандидаты отличаются одним базисным вектором. Большое ядро
+    (больше MAX_ENUMERATED_NULLITY векторов) перебрать нельзя, и результат
+    не точен: это лучшее из решений, найденных эвристикой (см. _search).
+    Исходное решение при этом никогда не ухудшается.
+    """
+    if len(null_space) > MAX_ENUMERATED_NULLITY:
+        return _search(presses, null_space)
+    best = presses
+    best_weight = popcount(presses)
+    current = presses
+    for i in range(1, 1 << len(null_space)):
+        current ^= null_space[(i & -i).bit_length() - 1]
+        weight = popcount(current)
+        if weight < best_weight:
+            best, best_weight = current, weight
+    return best
+
+
+def _search(presses, null_space):
+    """Поиск легкого решения для большого ядра (минимум не гарантируется)
+
+    Каждый перезапуск приводит базис ядра к ступенчатому виду по случайно
+    выбранным столбцам и берет решение, в котором все эти нажатия нулевые
+    (так находится короткое решение, не задевающее выбранных столбцов), а
+    затем улучшает его добавлением одного базисного вектора. Лучшее из
+    перезапусков дополнительно улучшается добавлением пар векторов.
+    Генератор случайных чисел зависит только от presses, поэтому ответ
+    для одного поля всегда один и тот же.
+    """
+    rng = random.Random(presses)
+    best, best_basis = presses, null_space
+    best_weight = popcount(presses)
+    words = max(vector.bit_length() for vector in null_space) // 64 + 1
+    work = len(null_space) ** 2 * words
+    restarts = max(MIN_SEARCH_RESTARTS, min(MAX_SEARCH_RESTARTS, MAX_SEARCH_WORK // work))
+    for _ in range(restarts):
+        candidate, basis = _reduce(presses, null_space, rng)
+        candidate, weight = _improve(candidate, basis)
+        if weight < best_weight:
+            best, best_basis, best_weight = candidate, basis, weight
+    return _improve(best, best_basis, pairs=True)[0]
+
+
+def _reduce(presses, null_space, rng):
+    """Приведение базиса ядра по случайным столбцам: (решение без этих нажатий, базис)"""
+    remaining = list(null_space)
+    rng.shuffle(remaining)
+    basis = []
+    while remaining:
+        vector = remaining.pop()
+        # Случайный столбец: младший ненулевой бит вектора не ниже случайной позиции
+        start = rng.randrange(vector.bit_length())
+        above = vector >> start << start
+        column = above & -above
+        remaining = [other ^ vector if other & column else other for other in remaining]
+        basis = [other ^ vector if other & column else other for other in basis]
+        if presses & column:
+            presses ^= vector
+        basis.append(vector)
+    return presses, basis
+
+
+def _improve(presses, basis, pairs=False):
+    """Локальный поиск: добавление векторов базиса (и их пар), пока это уменьшает число нажатий"""
+    weight = popcount(presses)
+    for _ in range(MAX_SEARCH_ROUNDS):
+        improved = False
+        for i, vector in enumerate(basis):
+            for other in (0, *basis[i + 1:]) if pairs else (0,):
+                candidate = presses ^ vector ^ other
+                candidate_weight = popcount(candidate)
+                if candidate_weight < weight:
+                    presses, weight = candidate, candidate_weight
+                    improved = True
+        if not improved:
+            break
+    return presses, weight
+
+
+class GF2Solver:
+    """Решение системы A·x = b над Z/2Z с заранее приведенной матрицей"""
+
+    def __init__(self, masks):
+        n = len(masks)
+        self._n = n
+
+        # Строка i системы - какие нажатия переключают клетку i
+        rows = [0] * n
+        for j, mask in enumerate(masks):
+            for i in iter_bits(mask):
+                rows[i] |= 1 << j
+
+        # Приведение [A | E] к упрощенному ступенчатому виду:
+        # combos[k] - какие исходные строки дали строку k
+        combos = [1 << i for i in range(n)]
+        pivots = []
+        rank = 0
+        for col in range(n):
+            bit = 1 << col
+            pivot = next((i for i in range(rank, n) if rows[i] & bit), None)
+            if pivot is None:
+                continue
+            rows[rank], rows[pivot] = rows[pivot], rows[rank]
+            combos[rank], combos[pivot] = combos[pivot], combos[rank]
+            for i in range(n):
+                if i != rank and rows[i] & bit:
+                    rows[i] ^= rows[rank]
+                    combos[i] ^= combos[rank]
+            pivots.append(col)
+            rank += 1
+
+        # Псевдообратная матрица по столбцам: вклад бита j поля в решение
+        inverse = [0] * n
+        for k, col in enumerate(pivots):
+            for j in iter_bits(combos[k]):
+                inverse[j] |= 1 << col
+        self._inverse = tuple(inverse)
+
+        # Нулевые строки: поле разрешимо, только если оно ортогонально им
+        self._checks = tuple(combos[rank:])
+
+        # Базис ядра: по одному вектору на каждую свободную переменную
+        pivot_set = set(pivots)
+        null_space = []
+        for free in range(n):
+            if free in pivot_set:
+                continue
+            vector = 1 << free
+            for k, col in enumerate(pivots):
+                if rows[k] >> free & 1:
+                    vector |= 1 << col
+            null_space.append(vector)
+        self._null_space = tuple(null_space)
+        self._rank = rank
+
+    @property
+    def rank(self):
+        """Ранг матрицы переключений"""
+        return self._rank
+
+    @property
+    def null_space(self):
+        """Базис ядра: наборы нажатий, не меняющие поле"""
+        return self._null_space
+
+    @property
+    def inverse(self):
+        """Столбцы псевдообратной матрицы: inverse[j] - вклад клетки j в решение"""
+        return self._inverse
+
+    @property
+    def checks(self):
+        """Проверки разрешимости: поле должно иметь четное пересечение с каждой"""
+        return self._checks
+
+    @property
+    def exact(self):
+        """Находит ли solve_optimal кратчайшее решение (ядро перебирается полностью)"""
+        return len(self._null_space) <= MAX_ENUMERATED_NULLITY
+
+    def is_solvable(self, board):
+        """Проверка, имеет ли поле решение"""
+        return not any(popcount(board & check) & 1 for check in self._checks)
+
+    def solve(self, board):
+        """Набор нажатий (битовая маска), гасящий поле, или None"""
+        if not self.is_solvable(board):
+            return None
+        inverse = self._inverse
+        presses = 0
+        for j in iter_bits(board):
+            presses ^= inverse[j]
+        return presses
+
+    def solve_optimal(self, board):
+        """Решение с наименьшим числом нажатий или None"""
+        presses = self.solve(board)
+        if presses is None:
+            return None
+        return minimum_weight(presses, self._null_space)
+
+
+class LightChasingSolver:
+    """Решение поля со стандартным соседством "погоней за светом"
+
+    Нажатия в строке k + 1 однозначно гасят строку k, поэтому все нажатия
+    определяются первой строкой f, а остаток в последней строке линейно
+    зависит от f: r(f) = M·f + r(0). Строки хранятся как n-битные числа,
+    и решать методом Гаусса нужно только систему n x n для первой строки.
+    """
+
+    def __init__(self, size):
+        n = size
+        self._size = n
+        self._full = (1 << n) - 1
+
+        # Нажатия строки k при пустом поле: x_k = A_k·f, где A_0 = E и
+        # A_{k+1} = A_{k-1} + T·A_k (T - трехдиагональная матрица строки).
+        # Все n столбцов A_k упакованы в одно число по n бит на столбец,
+        # так что рекуррентность считается сразу для всех столбцов.
+        block_starts = sum(1 << (j * n) for j in range(n))
+        keep_shifted_left = ((1 << (n * n)) - 1) ^ block_starts
+        keep_shifted_right = ((1 << (n * n)) - 1) ^ (block_starts << (n - 1))
+        previous, current = 0, sum(1 << (j * n + j) for j in range(n))
+        for _ in range(n):
+            shifted = ((current << 1) & keep_shifted_left) ^ ((current >> 1) & keep_shifted_right)
+            previous, current = current, previous ^ current ^ shifted
+
+        # M = A_n - многочлен от симметричной T, поэтому столбцы M совпадают со строками
+        self._first_row = GF2Solver(split_rows(current, n))
+        self._null_space = None
+        self._inverse = None
+        self._checks = None
+
+    @property
+    def rank(self):
+        """Ранг матрицы переключений"""
+        return self._size * self._size - len(self._first_row.null_space)
+
+    @property
+    def null_space(self):
+        """Базис ядра: наборы нажатий, не меняющие поле"""
+        if self._null_space is None:
+            empty = [0] * self._size
+            self._null_space = tuple(
+                join_rows(self._chase(empty, first)[0], self._size)
+                for first in self._first_row.null_space
+            )
+        return self._null_space
+
+    @property
+    def exact(self):
+        """Находит ли solve_optimal кратчайшее решение (ядро перебирается полностью)"""
+        return len(self._first_row.null_space) <= MAX_ENUMERATED_NULLITY
+
+    @property
+    def inverse(self):
+        """Столбцы псевдообратной матрицы: inverse[j] - вклад клетки j в решение"""
+        if self._inverse is None:
+            self._build_inverse()
+        return self._inverse
+
+    @property
+    def checks(self):
+        """Проверки разрешимости: поле должно иметь четное пересечение с каждой"""
+        if self._checks is None:
+            self._build_inverse()
+        return self._checks
+
+    def _build_inverse(self):
+        """Псевдообратная матрица и проверки для всех n^2 клеток (для пакетной обработки)
+
+        Погоня за светом линейна по полю и первой строке, поэтому решение
+        поля - сумма образов его клеток, как и у GF2Solver.
+        """
+        n = self._size
+        first_inverse = self._first_row.inverse
+        inverse = []
+        residuals = []
+        for cell in range(n * n):
+            rows = split_rows(1 << cell, n)
+            residual = self._chase(rows, 0)[1]
+            first = 0
+            for j in iter_bits(residual):
+                first ^= first_inverse[j]
+            inverse.append(join_rows(self._chase(rows, first)[0], n))
+            residuals.append(residual)
+        # Поле разрешимо, если остаток в последней строке проходит проверки первой строки
+        checks = []
+        for check in self._first_row.checks:
+            checks.append(sum(1 << cell for cell, residual in enumerate(residuals)
+                              if popcount(residual & check) & 1))
+        self._inverse = tuple(inverse)
+        self._checks = tuple(checks)
+
+    def _chase(self, rows, first):
+        """Погоня за светом: нажатия по строкам и остаток в последней строке"""
+        full = self._full
+        presses = [first]
+        previous, current = 0, first
+        for row in rows[:-1]:
+            previous, current = current, (row ^ previous ^ current
+                                          ^ ((current << 1) & full) ^ (current >> 1))
+            presses.append(current)
+        residual = rows[-1] ^ previous ^ current ^ ((current << 1) & full) ^ (current >> 1)
+        return presses, residual
+
+    def is_solvable(self, board):
+        """Проверка, имеет ли поле решение"""
+        rows = split_rows(board, self._size)
+        return self._first_row.is_solvable(self._chase(rows, 0)[1])
+
+    def solve(self, board):
+        """Набор нажатий (битовая маска), гасящий поле, или None"""
+        rows = split_rows(board, self._size)
+        first = self._first_row.solve(self._chase(rows, 0)[1])
+        if first is None:
+            return None
+        return join_rows(self._chase(rows, first)[0], self._size)
+
+    def solve_optimal(self, board):
+        """Решение с наименьшим числом нажатий или None"""
+        presses = self.solve(board)
+        if presses is None:
+            return None
+        return minimum_weight(presses, self.null_space)
+
+
+@lru_cache(maxsize=None)
+def get_solver(size, topology=DEFAULT_TOPOLOGY):
+    """Решатель для поля заданного размера и топологии (кэшируется)
+
+    "Погоня за светом" применима только к стандартному соседству; для
+    остальных топологий используется метод Гаусса по всем клеткам, поэтому
+    их размер ограничен MAX_TOPOLOGY_SIZE.
+    """
+    if topology == DEFAULT_TOPOLOGY:
+        if size > MAX_DENSE_SIZE:
+            return LightChasingSolver(size)
+    elif size > MAX_TOPOLOGY_SIZE:
+        raise ValueError(f"Нестандартное соседство поддерживает поля не более "
+                         f"{MAX_TOPOLOGY_SIZE} x {MAX_TOPOLOGY_SIZE}")
+    return GF2Solver(toggle_masks(size, topology))
+
+
+# Наибольший размер поля для игры с k состояниями: матрица n^2 x n^2 приводится целиком
+MAX_MODULAR_SIZE = 20
+
+
+def max_board_size(topology=DEFAULT_TOPOLOGY, states=2):
+    """Наибольший размер поля, для которого строится решатель, или None без ограничения"""
+    limits = []
+    if topology != DEFAULT_TOPOLOGY:
+        limits.append(MAX_TOPOLOGY_SIZE)
+    if states != 2:
+        limits.append(MAX_MODULAR_SIZE)
+    return min(limits, default=None)
+
+
+@lru_cache(maxsize=None)
+def prime_power_factors(value):
+    """Разложение числа на степени простых: ((p, e), ...)"""
+    factors = []
+    prime = 2
+    while prime * prime <= value:
+        if value % prime == 0:
+            power = 0
+            while value % prime == 0:
+                value //= prime
+                power += 1
+            factors.append((prime, power))
+        prime += 1
+    if value > 1:
+        factors.append((value, 1))
+    return tuple(factors)
+
+
+class PrimePowerSolver:
+    """Решение A·x = c над Z/p^eZ через диагональную форму P·A·Q = D
+
+    Кольцо Z/p^eZ локально: элемент подматрицы с наименьшей степенью p
+    делит все остальные её элементы, поэтому, взяв его ведущим, можно
+    обнулить и его столбец (операциями над строками, матрица P), и его
+    строку (операциями над столбцами, матрица Q). Для простого p (e = 1)
+    это обычный метод Гаусса над полем.
+    """
+
+    def __init__(self, matrix, prime, power):
+        modulus = prime ** power
+        n = len(matrix)
+        rows = [[value % modulus for value in row] for row in matrix]
+        left = [[int(i == j) for j in range(n)] for i in range(n)]
+        right = [[int(i == j) for j in range(n)] for i in range(n)]
+        pivots = []  # (p^v, обратный к множителю-единице) для элементов D
+
+        for t in range(n):
+            best = None
+            for r in range(t, n):
+                row = rows[r]
+                for c in range(t, n):
+                    if row[c]:
+                        valuation = _valuation(row[c], prime)
+                        if best is None or valuation < best[0]:
+                            best = (valuation, r, c)
+                            if not valuation:
+                                break
+                if best is not None and not best[0]:
+                    break
+            if best is None:
+                break
+
+            valuation, r, c = best
+            rows[t], rows[r] = rows[r], rows[t]
+            left[t], left[r] = left[r], left[t]
+            if c != t:
+                for row in rows:
+                    row[t], row[c] = row[c], row[t]
+                for row in right:
+                    row[t], row[c] = row[c], row[t]
+
+            scale = prime ** valuation
+            inverse = pow(rows[t][t] // scale, -1, modulus)
+            pivot_row, pivot_left = rows[t], left[t]
+            for r in range(t + 1, n):
+                if rows[r][t]:
+                    factor = rows[r][t] // scale * inverse % modulus
+                    rows[r] = [(a - factor * b) % modulus for a, b in zip(rows[r], pivot_row)]
+                    left[r] = [(a - factor * b) % modulus for a, b in zip(left[r], pivot_left)]
+            # Столбец t теперь нулевой вне строки t, поэтому операции над
+            # столбцами меняют в A только саму строку t
+            for c in range(t + 1, n):
+                if pivot_row[c]:
+                    factor = pivot_row[c] // scale * inverse % modulus
+                    for row in right:
+                        row[c] = (row[c] - factor * row[t]) % modulus
+                    pivot_row[c] = 0
+            pivots.append((scale, inverse))
+
+        self.modulus = modulus
+        self.rank = len(pivots)
+        self._left = left
+        self._right = right
+        self._pivots = pivots
+
+    def solve(self, target):
+        """Вектор x с A·x = target (mod p^e) или None, если решения нет"""
+        modulus = self.modulus
+        reduced = [sum(a * b for a, b in zip(row, target)) % modulus for row in self._left]
+        if any(reduced[self.rank:]):
+            return None
+        scaled = []
+        for value, (scale, inverse) in zip(reduced, self._pivots):
+            if value % scale:
+                return None
+            scaled.append(value // scale * inverse % modulus)
+        return [sum(a * b for a, b in zip(row, scaled)) % modulus for row in self._right]
+
+
+def _valuation(value, prime):
+    """Степень простого prime в ненулевом числе value"""
+    power = 0
+    while value % prime == 0:
+        value //= prime
+        power += 1
+    return power
+
+
+class ModularSolver:
+    """Решатель игры с k состояниями клетки (нажатие прибавляет 1 по модулю k)
+
+    Поле b решается нажатиями x, если A·x = -b (mod k). Для каждой степени
+    простого p^e из разложения k система приводится отдельно, а решения
+    склеиваются по китайской теореме об остатках.
+    """
+
+    def __init__(self, masks, states):
+        cells = len(masks)
+        matrix = [[masks[col] >> row & 1 for col in range(cells)] for row in range(cells)]
+        self.states = states
+        self._parts = []  # (решатель по модулю p^e, коэффициент КТО)
+        for prime, power in prime_power_factors(states):
+            modulus = prime ** power
+            cofactor = states // modulus
+            self._parts.append((PrimePowerSolver(matrix, prime, power),
+                                cofactor * pow(cofactor, -1, modulus) % states))
+
+    def solve(self, board):
+        """Число нажатий каждой клетки (bytearray) или None, если решения нет"""
+        states = self.states
+        target = [-value % states for value in board]
+        presses = [0] * len(target)
+        for part, coefficient in self._parts:
+            solution = part.solve(target)
+            if solution is None:
+                return None
+            presses = [(total + coefficient * value) % states for total, value in zip(presses, solution)]
+        return bytearray(presses)
+
+    def is_solvable(self, board):
+        """Проверка разрешимости поля"""
+        return self.solve(board) is not None
+
+
+@lru_cache(maxsize=None)
+def get_modular_solver(size, states, topology=DEFAULT_TOPOLOGY):
+    """Решатель игры с states состояниями для поля и топологии (кэшируется)"""
+    if size > MAX_MODULAR_SIZE:
+        raise ValueError(f"Игра с {states} состояниями поддерживает поля не более "
+                         f"{MAX_MODULAR_SIZE} x {MAX_MODULAR_SIZE}")
+    return ModularSolver(toggle_masks(size, topology), states)
@@ -0,0 +1,146 @@
+"""Тесты каталога выданных головоломок"""
+
+import random
+import threading
+
+import pytest
+
+import catalogue
+from bitboard import DEFAULT_TOPOLOGY, TOPOLOGIES, canonical_form, rotate_180, transpose
+from catalogue import KIND_BITMAP, KIND_HASH, PuzzleCatalogue, get_catalogue
+from game_logic import Game
+from puzzle_provider import PuzzleProvider
+
+
+@pytest.fixture
+def catalogue_dir(tmp_path, monkeypatch):
+    """Каталоги во временной папке и пустой кэш открытых каталогов"""
+    monkeypatch.setattr(catalogue, "CATALOGUE_DIR", str(tmp_path))
+    monkeypatch.setattr(catalogue, "_catalogues", {})
+    return tmp_path
+
+
+def distinct_boards(size, count, seed=0):
+    """Поля, попарно различные с точностью до поворотов и отражений"""
+    rng = random.Random(seed)
+    boards = {}
+    while len(boards) < count:
+        board = rng.getrandbits(size * size)
+        boards.setdefault(canonical_form(board, size), board)
+    return list(boards.values())
+
+
+@pytest.mark.parametrize("size, kind", [(5, KIND_BITMAP), (7, KIND_HASH)])
+def test_add_contains_discard(tmp_path, size, kind):
+    puzzles = PuzzleCatalogue(str(tmp_path / "catalogue.bin"), size)
+    assert puzzles._kind == kind
+    board = distinct_boards(size, 1)[0]
+    assert board not in puzzles
+    assert puzzles.add(board)
+    # Симметричные образы - та же головоломка
+    assert not puzzles.add(transpose(board, size))
+    assert rotate_180(board, size) in puzzles
+    assert len(puzzles) == 1
+    assert puzzles.discard(board)
+    assert board not in puzzles and len(puzzles) == 0
+    assert not puzzles.discard(board)
+    puzzles.close()
+
+
+def test_hash_table_grows_and_survives_reopen(tmp_path):
+    path = str(tmp_path / "catalogue.bin")
+    PuzzleCatalogue._create(path, 7, 16)
+    puzzles = PuzzleCatalogue(path, 7)
+    boards = distinct_boards(7, 3000)
+    for board in boards:
+        assert puzzles.add(board)
+    assert puzzles._capacity > 16
+    assert all(board in puzzles for board in boards)
+    # Удаление со сдвигом не должно терять отпечатки из той же цепочки пробирования
+    removed, kept = boards[::2], boards[1::2]
+    for board in removed:
+        assert puzzles.discard(board)
+    assert not any(board in puzzles for board in removed)
+    assert all(board in puzzles for board in kept)
+    puzzles.close()
+
+    reopened = PuzzleCatalogue(path, 7)
+    assert len(reopened) == len(kept)
+    assert all(board in reopened for board in kept)
+    reopened.close()
+
+
+def test_wrong_size_is_rejected(tmp_path):
+    path = str(tmp_path / "catalogue.bin")
+    PuzzleCatalogue(path, 6).close()
+    with pytest.raises(ValueError):
+        PuzzleCatalogue(path, 7)
+
+
+def test_concurrent_add(tmp_path):
+    puzzles = PuzzleCatalogue(str(tmp_path / "catalogue.bin"), 7)
+    boards = distinct_boards(7, 2000)
+    added = []
+
+    def worker(seed):
+        order = boards[:]
+        random.Random(seed).shuffle(order)
+        added.extend(board for board in order if puzzles.add(board))
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Каждое поле добавлено ровно одним потоком
+    assert sorted(added) == sorted(boards)
+    assert len(puzzles) == len(boards)
+    puzzles.close()
+
+
+def test_get_catalogue_returns_one_object_per_file(catalogue_dir):
+    results = []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        results.append(get_catalogue(7, DEFAULT_TOPOLOGY))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results[0] is not None
+    assert all(result is results[0] for result in results)
+    assert get_catalogue(7, TOPOLOGIES["torus"]) is not results[0]
+
+
+def test_get_catalogue_without_writable_directory(tmp_path, monkeypatch):
+    blocker = tmp_path / "file"
+    blocker.write_bytes(b"")
+    monkeypatch.setattr(catalogue, "CATALOGUE_DIR", str(blocker / "data"))
+    monkeypatch.setattr(catalogue, "_catalogues", {})
+    assert get_catalogue(5, DEFAULT_TOPOLOGY) is None
+
+
+def test_game_does_not_use_catalogue_by_default(catalogue_dir):
+    game = Game('Средний', 5)
+    game.reset_game()
+    assert not list(catalogue_dir.iterdir())
+    puzzles = get_catalogue(5, DEFAULT_TOPOLOGY)
+    game.reset_game(catalogue=puzzles)
+    assert game.initial_board in puzzles
+
+
+def test_provider_marks_only_puzzles_it_hands_out(catalogue_dir):
+    provider = PuzzleProvider(5, queue_size=3, workers=4, unique=True)
+    provider.prefetch()
+    taken = [provider.take('Легкий')[0] for _ in range(5)]
+    provider.set_board(6)
+    provider.shutdown()
+    provider._executor.shutdown(wait=True)
+    puzzles = get_catalogue(5, DEFAULT_TOPOLOGY)
+    assert all(board in puzzles for board in taken)
+    assert len(puzzles) == len({canonical_form(board, 5) for board in taken})
+    assert len(get_catalogue(6, DEFAULT_TOPOLOGY)) == 0
@@ -0,0 +1,93 @@
+"""Тесты двоичной записи партий и команды lightsout validate"""
+
+import json
+
+import pytest
+
+import lightsout
+from bitboard import TOPOLOGIES
+from game_logic import Game
+from replay import (HEADER, dumps, iter_replays, load_game, parse_replay, save_game, validate_file)
+
+
+def played_game(size=5, topology=TOPOLOGIES["plus"], solve=True):
+    """Партия с несколькими ходами (solve=True - доведенная до победы)"""
+    game = Game('Средний', size, topology)
+    game.reset_game()
+    game.make_move(0, 0)
+    game.make_move(0, 0)
+    if solve:
+        for row, col in game.press_sequence():
+            game.make_move(row, col)
+    else:
+        game.make_move(size - 1, size - 1)
+    return game
+
+
+@pytest.mark.parametrize("name", list(TOPOLOGIES))
+def test_roundtrip(name):
+    game = played_game(topology=TOPOLOGIES[name])
+    replay, end = parse_replay(dumps(game))
+    assert end == len(dumps(game))
+    assert replay.size == game.size
+    assert replay.topology == game.topology
+    assert replay.initial_board == game.initial_board
+    assert list(replay.log) == list(game.history)
+    assert replay.final_board() == game.board == 0
+    restored = replay.to_game()
+    assert restored.board == game.board and restored.moves == game.moves
+
+
+def test_wide_log_roundtrip():
+    game = Game('Легкий', 300)
+    game.reset_game(board=0)
+    game.make_move(299, 299)
+    game.make_move(299, 299)
+    replay, _ = parse_replay(dumps(game))
+    assert list(replay.log) == [299 * 300 + 299] * 2
+    assert replay.is_valid()
+
+
+def test_several_records_in_one_file(tmp_path):
+    path = tmp_path / "replays.bin"
+    save_game(played_game(), path)
+    save_game(played_game(solve=False), path, append=True)
+    save_game(played_game(size=7), path, append=True)
+    assert validate_file(path) == [True, False, True]
+    data = path.read_bytes()
+    assert [replay.size for replay in iter_replays(data)] == [5, 5, 7]
+    assert load_game(tmp_path / "replays.bin").size == 5
+
+
+def test_truncated_record_raises_value_error():
+    data = dumps(played_game())
+    for length in range(1, len(data)):
+        with pytest.raises(ValueError):
+            parse_replay(data[:length])
+
+
+def test_corrupt_magic_raises_value_error():
+    data = bytearray(dumps(played_game()))
+    data[0:4] = b"XXXX"
+    with pytest.raises(ValueError):
+        parse_replay(bytes(data))
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.bin"
+    path.write_bytes(b"")
+    assert validate_file(path) == []
+
+
+def test_validate_command_reports_corrupt_record(tmp_path, capsys):
+    good = dumps(played_game())
+    broken = tmp_path / "broken.bin"
+    broken.write_bytes(good + good[:HEADER.size + 3])
+    valid = tmp_path / "valid.bin"
+    valid.write_bytes(good)
+    lightsout.main(["validate", str(broken), str(tmp_path / "missing.bin"), str(valid)])
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert lines[0] == {"file": str(broken), "index": 0, "valid": True}
+    assert lines[1]["file"] == str(broken) and lines[1]["index"] == 1 and "error" in lines[1]
+    assert lines[2]["file"].endswith("missing.bin") and "error" in lines[2]
+    assert lines[3] == {"file": str(valid), "index": 0, "valid": True}
@@ -0,0 +1,146 @@
+"""Тесты решателей: сравнение с полным перебором на малых полях"""
+
+import random
+
+import pytest
+
+from bitboard import DEFAULT_TOPOLOGY, TOPOLOGIES, popcount, toggle_masks
+from solver import (MAX_ENUMERATED_NULLITY, MAX_TOPOLOGY_SIZE, GF2Solver, LightChasingSolver,
+                    get_solver, max_board_size, minimum_weight)
+
+
+def brute_force(size, topology):
+    """Наименьшее число нажатий для каждого разрешимого поля: перебор всех наборов нажатий"""
+    masks = toggle_masks(size, topology)
+    best = {0: 0}
+    board = presses = 0
+    for i in range(1, 1 << len(masks)):
+        bit = (i & -i).bit_length() - 1
+        board ^= masks[bit]
+        presses ^= 1 << bit
+        weight = popcount(presses)
+        if best.get(board, weight + 1) > weight:
+            best[board] = weight
+    return best
+
+
+def rank(vectors):
+    """Ранг набора векторов над Z/2Z"""
+    basis = []  # Векторы с различными старшими битами по убыванию
+    for vector in vectors:
+        for row in basis:
+            vector = min(vector, vector ^ row)
+        if vector:
+            basis.append(vector)
+            basis.sort(reverse=True)
+    return len(basis)
+
+
+def press(board, presses, masks):
+    """Поле после нажатия клеток из маски presses"""
+    index = 0
+    while presses:
+        if presses & 1:
+            board ^= masks[index]
+        presses >>= 1
+        index += 1
+    return board
+
+
+@pytest.mark.parametrize("name", list(TOPOLOGIES))
+@pytest.mark.parametrize("size", [1, 2, 3, 4])
+def test_solve_optimal_matches_brute_force(size, name):
+    topology = TOPOLOGIES[name]
+    masks = toggle_masks(size, topology)
+    solver = get_solver(size, topology)
+    best = brute_force(size, topology)
+    boards = range(1 << (size * size))
+    if size == 4:
+        boards = random.Random(size).sample(boards, 2000)
+    for board in boards:
+        assert solver.is_solvable(board) == (board in best)
+        presses = solver.solve(board)
+        optimal = solver.solve_optimal(board)
+        if board not in best:
+            assert presses is None and optimal is None
+            continue
+        assert press(board, presses, masks) == 0
+        assert press(board, optimal, masks) == 0
+        assert popcount(optimal) == best[board]
+
+
+@pytest.mark.parametrize("name", ["torus", "moore", "moore-torus"])
+@pytest.mark.parametrize("size", [4, 5, 6, 12])
+def test_null_space_of_other_topologies(size, name):
+    topology = TOPOLOGIES[name]
+    masks = toggle_masks(size, topology)
+    solver = get_solver(size, topology)
+    null_space = solver.null_space
+    assert len(null_space) == size * size - solver.rank
+    # Каждый вектор ядра не меняет поле, и векторы линейно независимы
+    for vector in null_space:
+        assert vector and press(0, vector, masks) == 0
+    assert rank(null_space) == len(null_space)
+
+
+def test_known_nullities():
+    assert len(get_solver(5).null_space) == 2
+    assert len(get_solver(4).null_space) == 4
+    assert len(get_solver(5, TOPOLOGIES["torus"]).null_space) == 8
+    assert len(get_solver(6, TOPOLOGIES["moore-torus"]).null_space) == 20
+
+
+def test_minimum_weight_gray_code_matches_span():
+    rng = random.Random(1)
+    for _ in range(50):
+        null_space = [rng.getrandbits(40) for _ in range(rng.randint(1, 8))]
+        presses = rng.getrandbits(40)
+        span = [presses]
+        for vector in null_space:
+            span += [value ^ vector for value in span]
+        assert popcount(minimum_weight(presses, null_space)) == min(map(popcount, span))
+
+
+def test_minimum_weight_large_null_space_is_heuristic_but_sound():
+    topology = TOPOLOGIES["torus"]
+    solver = get_solver(20, topology)
+    assert len(solver.null_space) > MAX_ENUMERATED_NULLITY and not solver.exact
+    masks = toggle_masks(20, topology)
+    rng = random.Random(2)
+    for _ in range(5):
+        board = 0
+        for index in rng.sample(range(400), 3):
+            board ^= masks[index]
+        presses = solver.solve(board)
+        optimal = solver.solve_optimal(board)
+        assert press(board, optimal, masks) == 0
+        assert popcount(optimal) <= min(3, popcount(presses))
+        # Случайный поиск зависит только от входа
+        assert solver.solve_optimal(board) == optimal
+
+
+def test_light_chasing_matches_gaussian_elimination():
+    size = 17
+    chasing = get_solver(size)
+    dense = GF2Solver(toggle_masks(size))
+    assert isinstance(chasing, LightChasingSolver)
+    assert chasing.rank == dense.rank
+    masks = toggle_masks(size)
+    rng = random.Random(3)
+    for _ in range(20):
+        board = press(0, rng.getrandbits(size * size), masks)
+        assert press(board, chasing.solve(board), masks) == 0
+        assert popcount(chasing.solve_optimal(board)) == popcount(dense.solve_optimal(board))
+    unsolvable = next(1 << cell for cell in range(size * size) if not dense.is_solvable(1 << cell))
+    assert chasing.solve(unsolvable) is None
+
+
+def test_topology_size_limit():
+    for name, topology in TOPOLOGIES.items():
+        if topology == DEFAULT_TOPOLOGY:
+            assert max_board_size(topology) is None
+            continue
+        assert max_board_size(topology) == MAX_TOPOLOGY_SIZE
+        with pytest.raises(ValueError):
+            get_solver(MAX_TOPOLOGY_SIZE + 1, topology)
+    assert isinstance(get_solver(MAX_TOPOLOGY_SIZE + 1), LightChasingSolver)
@@ -1,14 +1,16 @@
 #!/usr/bin/env python3
 """
-UI компоненты для игры "Выключи свет"
+Диалоги игры "Выключи свет"
+
+Модуль импортируется главным окном при первом открытии диалога, а не
+при запуске: игровое поле находится в board_widget.py.
 """
 
-from PyQt6.QtWidgets import (QPushButton, QDialog, QVBoxLayout, QHBoxLayout, 
+from PyQt6.QtWidgets import (QPushButton, QDialog, QVBoxLayout, QHBoxLayout,
                             QFormLayout, QColorDialog, QTextEdit, QLabel)
-from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QColor, QFont
 
-from config import DEFAULT_LIGHT_COLOR, DEFAULT_DARK_COLOR, BUTTON_SIZE, BUTTON_STYLE, RULES_HTML
+from config import DEFAULT_LIGHT_COLOR, DEFAULT_DARK_COLOR, RULES_HTML
 
 
 class SettingsDialog(QDialog):
@@ -100,39 +102,6 @@ class RulesDialog(QDialog):
         self.setLayout(layout)
 
 
-class LightButton(QPushButton):
-    """Кнопка-лампочка"""
-    
-    clicked_with_position = pyqtSignal(int, int)
-    
-    def __init__(self, row, col, parent=None):
-        super().__init__(parent)
-        self.row = row
-        self.col = col
-        self.is_on = False
-        self.light_color = DEFAULT_LIGHT_COLOR
-        self.dark_color = DEFAULT_DARK_COLOR
-        
-        self.setFixedSize(BUTTON_SIZE, BUTTON_SIZE)
-        self.clicked.connect(self._on_clicked)
-        self.update_appearance()
-    
-    def _on_clicked(self):
-        self.clicked_with_position.emit(self.row, self.col)
-    
-    def set_state(self, is_on, light_color=DEFAULT_LIGHT_COLOR, dark_color=DEFAULT_DARK_COLOR):
-        """Установка состояния лампочки"""
-        self.is_on = is_on
-        self.light_color = light_color
-        self.dark_color = dark_color
-        self.update_appearance()
-    
-    def update_appearance(self):
-        """Обновление внешнего вида"""
-        color = self.light_color if self.is_on else self.dark_color
-        self.setStyleSheet(BUTTON_STYLE.format(color=color))
-
-
 class DifficultySelectionDialog(QDialog):
     """Диалог выбора уровня сложности"""
     